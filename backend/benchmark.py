@@ -0,0 +1,282 @@
+"""Benchmark the generator and the API in-process against an in-memory Mongo.
+
+    python backend/benchmark.py --output benchmarks/before.json
+    python backend/benchmark.py --output benchmarks/after.json --compare benchmarks/before.json
+
+No server or database is needed: requests go through the ASGI app directly and
+storage is the Mongo backend over mongomock-motor, or the memory backend with
+--backend memory. Absolute numbers therefore say little
+about production, but runs on the same machine are comparable, which is what
+catching regressions needs. Results are written as a flat JSON object of
+metric name to value, so two runs can be compared with --compare or any diff
+tool.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+# server.py reads these at import time; the mock client below replaces the connection
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'benchmark')
+
+GENERATE_COUNTS = [10, 100, 1000]
+EXPORT_FORMATS = ["json", "csv"]
+
+
+def summarize(name: str, samples: list) -> dict:
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    samples = sorted(samples)
+    return {
+        f"{name}.median_ms": statistics.median(samples) * 1000,
+        f"{name}.p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        f"{name}.min_ms": samples[0] * 1000,
+    }
+
+
+async def timed(call) -> float:
+    started = time.perf_counter()
+    await call()
+    return time.perf_counter() - started
+
+
+def bench_generator(rows: int) -> dict:
+    from generation import generate_realistic_transaction, generate_transaction_batch
+
+    now = datetime.utcnow()
+    rng = np.random.default_rng(0)
+
+    started = time.perf_counter()
+    for _ in range(rows):
+        generate_realistic_transaction(now=now).model_dump()
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    generate_transaction_batch(rows, rng=rng, now=now).to_documents()
+    batched = time.perf_counter() - started
+
+    return {
+        "generator.single_row.rows_per_sec": rows / single,
+        "generator.batched.rows_per_sec": rows / batched,
+    }
+
+
+async def bench_generate(client, repeat: int) -> dict:
+    results = {}
+    for count in GENERATE_COUNTS:
+        async def call():
+            response = await client.post("/api/transactions/generate", json={"count": count})
+            response.raise_for_status()
+
+        # Start every sample from an empty collection so earlier samples don't slow later ones
+        samples = []
+        for _ in range(repeat):
+            await client.delete("/api/transactions")
+            samples.append(await timed(call))
+        results.update(summarize(f"generate.count_{count}", samples))
+        results[f"generate.count_{count}.rows_per_sec"] = count / statistics.median(samples)
+    return results
+
+
+async def seed_transactions(server, count: int, seed: int):
+    from models import TransactionGenerateRequest
+
+    params = TransactionGenerateRequest().generation_params()
+    chunks = server.generate_document_chunks(count, seed, datetime.utcnow(), params)
+    report = await server.bulk_insert_transactions(chunks)
+    server.invalidate_stats()
+    return report.inserted
+
+
+async def bench_stats(server, client, checkpoints: list, repeat: int) -> dict:
+    results = {}
+    stored = 0
+    for size in checkpoints:
+        # A different seed per batch keeps ids from colliding with the previous ones
+        stored += await seed_transactions(server, size - stored, seed=size)
+
+        async def call():
+            response = await client.get("/api/transactions/stats")
+            response.raise_for_status()
+
+        misses = []
+        for _ in range(repeat):
+            server.invalidate_stats()
+            misses.append(await timed(call))
+        hits = [await timed(call) for _ in range(repeat)]
+        results.update(summarize(f"stats.rows_{size}.uncached", misses))
+        results.update(summarize(f"stats.rows_{size}.cached", hits))
+    return results
+
+
+async def bench_list(client, rows: int, page_size: int, repeat: int) -> dict:
+    results = {}
+    depths = sorted({0, rows // 10, rows // 2, rows - page_size})
+
+    for depth in depths:
+        async def skip_page():
+            response = await client.get("/api/transactions", params={"limit": page_size, "skip": depth})
+            response.raise_for_status()
+        results.update(summarize(f"list.skip_{depth}", [await timed(skip_page) for _ in range(repeat)]))
+
+    # Walk the keyset cursors once, then time the page sitting at each depth
+    cursors = {0: None}
+    cursor = None
+    for position in range(page_size, max(depths) + 1, page_size):
+        response = await client.get("/api/transactions", params={"limit": page_size, **({"cursor": cursor} if cursor else {})})
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        cursors[position] = cursor
+
+    for depth in depths:
+        position = max(position for position in cursors if position <= depth)
+        cursor = cursors[position]
+
+        async def cursor_page():
+            params = {"limit": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get("/api/transactions", params=params)
+            response.raise_for_status()
+        results.update(summarize(f"list.cursor_{position}", [await timed(cursor_page) for _ in range(repeat)]))
+
+    return results
+
+
+async def bench_export(server, rows: int) -> dict:
+    """Drain export bodies straight from the endpoint, so peak memory is the server's alone"""
+    from models import BulkExportRequest
+
+    results = {}
+    for format in EXPORT_FORMATS:
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = await server.export_transactions(BulkExportRequest(format=format), accept_encoding=None)
+        size = 0
+        async for chunk in response.body_iterator:
+            size += len(chunk)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[f"export.{format}.rows_per_sec"] = rows / elapsed
+        results[f"export.{format}.mb_per_sec"] = size / elapsed / 1e6
+        results[f"export.{format}.bytes"] = size
+        results[f"export.{format}.peak_memory_mb"] = peak / 1e6
+    return results
+
+
+def in_process_client(app):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+
+
+def use_test_store(backend: str):
+    """Point the app at an in-process store: the memory backend, or the Mongo one over mongomock"""
+    from storage import create_store, set_store
+
+    if backend == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+
+        import database
+        database.use_client(AsyncMongoMockClient(), os.environ['DB_NAME'])
+        backend = "mongo"
+    set_store(create_store(backend))
+
+
+async def run(args) -> dict:
+    import server
+    from storage import get_store
+
+    use_test_store(args.backend)
+    await get_store().setup()
+
+    results = bench_generator(args.generator_rows)
+    async with in_process_client(server.app) as client:
+        results.update(await bench_generate(client, args.repeat))
+        await client.delete("/api/transactions")
+
+        checkpoints = sorted({max(args.page_size, args.rows // 4), max(args.page_size, args.rows // 2), args.rows})
+        results.update(await bench_stats(server, client, checkpoints, args.repeat))
+        results.update(await bench_list(client, args.rows, args.page_size, args.repeat))
+        results.update(await bench_export(server, args.rows))
+
+    if server.generation_pool is not None:
+        server.generation_pool.shutdown()
+    await get_store().close()
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict):
+    """Print the relative change of every metric present in both runs"""
+    for name in sorted(results.keys() & baseline.keys()):
+        before, after = baseline[name], results[name]
+        change = (after - before) / before * 100 if before else float("inf")
+        print(f"{name:<45} {before:>14.3f} {after:>14.3f} {change:>+8.1f}%")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the generator and the API against an in-memory Mongo")
+    parser.add_argument("--output", required=True, help="where to write the results, e.g. benchmarks/before.json")
+    parser.add_argument("--compare", default=None, help="previous results file to compare against")
+    parser.add_argument("--backend", choices=["mongomock", "memory"], default="mongomock", help="in-process storage to run against")
+    parser.add_argument("--rows", type=int, default=20000, help="transactions stored for the stats, list and export benchmarks")
+    parser.add_argument("--generator-rows", type=int, default=20000, help="rows per generator benchmark")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20, help="samples per latency measurement")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.rows < args.page_size:
+        sys.exit("--rows must be at least --page-size")
+
+    results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": vars(args),
+        },
+        "results": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, sort_keys=True))
+    sys.stderr.write(f"Wrote {len(results)} results to {args.output}\n")
+
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text())["results"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Generate transactions straight to local files, without MongoDB or the API.
+
+    python backend/cli.py --count 100000000 --format parquet --output fixtures/ --seed 42
+
+Rows come from the same seeded chunk generator as the API, so a given seed and
+set of parameters produce the same transactions here as through
+POST /api/transactions/generate. Output is split into shards of whole chunks
+that are written in parallel, one process per CPU core by default.
+
+With --lifecycles, --count is the number of payments, each written in time
+order alongside the refunds, disputes and chargebacks that follow it. Shards
+are ordered within themselves; follow-ups of a shard's last payments that fall
+past its chunk range close the shard instead of opening the next one.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from pathlib import Path
+
+from entities import get_pool
+from generation import (
+    SEED_CHUNK_SIZE, STATUSES, TRANSACTION_TYPES, generate_seeded_chunk, new_seed, seeded_chunk_count
+)
+from lifecycles import LifecycleMerger, count_lifecycles, generate_lifecycle_chunk
+from models import MAX_RUN_COUNT, MAX_SEED
+from scenarios import ScenarioError, get_scenario
+
+FILE_EXTENSIONS = {"csv": "csv", "ndjson": "ndjson", "parquet": "parquet"}
+
+# Rows written by all workers so far, shared through the pool initializer
+_progress = None
+
+
+def _init_worker(progress):
+    global _progress
+    _progress = progress
+
+
+def make_encoder(format: str):
+    if format == "parquet":
+        from columnar import ColumnarEncoder
+        return ColumnarEncoder("parquet")
+    from encoders import RowEncoder
+    return RowEncoder(format)
+
+
+def write_shard(
+    path: str,
+    format: str,
+    seed: int,
+    count: int,
+    first_chunk: int,
+    last_chunk: int,
+    now: datetime,
+    params: dict,
+    lifecycles: bool = False
+) -> int:
+    """Generate chunks [first_chunk, last_chunk) of a seeded run into one file"""
+    encoder = make_encoder(format)
+    merger = LifecycleMerger(count, now, params["days_back"], first_chunk) if lifecycles else None
+    rows = 0
+
+    def write(documents, done):
+        nonlocal rows
+        output.write(encoder.encode(documents))
+        rows += len(documents)
+        if _progress is not None:
+            with _progress.get_lock():
+                _progress.value += done
+
+    with open(path, "wb") as output:
+        output.write(encoder.header())
+        for chunk_index in range(first_chunk, last_chunk):
+            if merger is None:
+                documents = generate_seeded_chunk(seed, chunk_index, count, now, **params).to_documents()
+                write(documents, len(documents))
+            else:
+                documents = merger.merge(*generate_lifecycle_chunk(seed, chunk_index, count, now, params))
+                write(documents, count_lifecycles(documents))
+        if merger is not None:
+            write(merger.drain(), 0)
+        output.write(encoder.footer())
+    return rows
+
+
+def shard_ranges(chunk_total: int, shards: int):
+    """Split chunk indexes into `shards` contiguous, nearly equal ranges"""
+    shards = max(1, min(shards, chunk_total))
+    base, extra = divmod(chunk_total, shards)
+    start = 0
+    for shard in range(shards):
+        end = start + base + (1 if shard < extra else 0)
+        yield shard, start, end
+        start = end
+
+
+def print_progress(done: int, total: int, started: float, final: bool = False):
+    elapsed = max(time.monotonic() - started, 1e-9)
+    rate = done / elapsed
+    eta = (total - done) / rate if rate else float("inf")
+    line = f"\r{done:,}/{total:,} rows ({done / total:.1%}) {rate:,.0f} rows/s"
+    line += f" in {elapsed:.1f}s" if final else f" ETA {eta:.0f}s"
+    sys.stderr.write(line.ljust(80) + ("\n" if final else ""))
+    sys.stderr.flush()
+
+
+def parse_reference_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generate mock PayPal transactions into local files")
+    parser.add_argument("--count", type=int, required=True, help="number of transactions to generate")
+    parser.add_argument("--format", choices=sorted(FILE_EXTENSIONS), default="ndjson")
+    parser.add_argument("--output", default="transactions", help="output directory")
+    parser.add_argument("--prefix", default="transactions", help="output file name prefix")
+    parser.add_argument("--shards", type=int, default=None, help="number of output files (default: one per worker)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="generator processes")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible output (default: random)")
+    parser.add_argument("--reference-time", type=parse_reference_time, default=None,
+                        help="end of the timestamp window as ISO-8601 (default: now)")
+    parser.add_argument("--transaction-type", choices=TRANSACTION_TYPES, default=None)
+    parser.add_argument("--status", choices=STATUSES, default=None)
+    parser.add_argument("--min-amount", type=float, default=1.0)
+    parser.add_argument("--max-amount", type=float, default=1000.0)
+    parser.add_argument("--currency", default="USD")
+    parser.add_argument("--days-back", type=int, default=30)
+    parser.add_argument("--scenario", default=None, help="scenario profile to draw distributions from")
+    parser.add_argument("--lifecycles", action="store_true",
+                        help="generate --count payments with their refunds, disputes and chargebacks")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if not 1 <= args.count <= MAX_RUN_COUNT:
+        sys.exit(f"--count must be between 1 and {MAX_RUN_COUNT}")
+    if args.max_amount < args.min_amount:
+        sys.exit("--max-amount must not be less than --min-amount")
+    if args.seed is not None and not 0 <= args.seed <= MAX_SEED:
+        sys.exit(f"--seed must be between 0 and {MAX_SEED}")
+
+    seed = args.seed if args.seed is not None else new_seed()
+    now = args.reference_time or datetime.utcnow()
+    params = {
+        "transaction_type": args.transaction_type,
+        "status": args.status,
+        "min_amount": args.min_amount,
+        "max_amount": args.max_amount,
+        "currency": args.currency,
+        "days_back": args.days_back,
+        "scenario": args.scenario
+    }
+    if args.scenario is not None:
+        try:
+            get_scenario(args.scenario)
+        except ScenarioError as e:
+            sys.exit(str(e))
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = max(1, args.workers)
+    chunk_total = seeded_chunk_count(args.count)
+    shards = list(shard_ranges(chunk_total, args.shards or workers))
+    digits = max(5, len(str(len(shards) - 1)))
+
+    sys.stderr.write(
+        f"Generating {args.count:,} rows as {args.format} into {len(shards)} shard(s) "
+        f"with {workers} worker(s), seed {seed}, {SEED_CHUNK_SIZE} rows per chunk\n"
+    )
+
+    # Workers load the pool from the disk cache, so build it once up front
+    get_pool()
+
+    progress = multiprocessing.Value("q", 0)
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(progress,)) as pool:
+        futures = {
+            pool.submit(
+                write_shard,
+                str(output_dir / f"{args.prefix}-{shard:0{digits}d}.{FILE_EXTENSIONS[args.format]}"),
+                args.format, seed, args.count, first_chunk, last_chunk, now, params, args.lifecycles
+            ): shard
+            for shard, first_chunk, last_chunk in shards
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                # Surface worker errors immediately instead of after every shard finished
+                future.result()
+            print_progress(progress.value, args.count, started)
+
+    print_progress(progress.value, args.count, started, final=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Chunk-by-chunk gzip/zstd compression for streamed and buffered responses"""
+import zlib
+from typing import AsyncIterable, AsyncIterator, Optional
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Server preference when a client accepts several encodings
+PREFERRED_ENCODINGS = ["zstd", "gzip"]
+
+FILE_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+FILE_MEDIA_TYPES = {"gzip": "application/gzip", "zstd": "application/zstd"}
+
+
+def zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in PREFERRED_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality <= 0:
+            continue
+        if encoding == "zstd" and not zstd_available():
+            continue
+        return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "gzip":
+            self.compressobj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.block_flush_mode = zlib.Z_SYNC_FLUSH
+        elif encoding == "zstd":
+            import zstandard
+            self.compressobj = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self.block_flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressobj.compress(data)
+
+    def flush_block(self) -> bytes:
+        """Everything compressed so far, decodable on its own, without ending the stream"""
+        return self.compressobj.flush(self.block_flush_mode)
+
+    def flush(self) -> bytes:
+        return self.compressobj.flush()
+
+
+async def compress_stream(chunks: AsyncIterable, encoding: str, flush_chunks: bool = False) -> AsyncIterator[bytes]:
+    """Compress a streaming body as it is produced, never holding more than one chunk.
+
+    The compressor otherwise holds output back until its window fills, which for
+    a slow live stream can take minutes; `flush_chunks` sends each chunk's rows
+    as soon as they are produced, at some cost in compression ratio.
+    """
+    compressor = _Compressor(encoding)
+    async for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        compressed = compressor.compress(chunk)
+        if flush_chunks and chunk:
+            compressed += compressor.flush_block()
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    compressor = _Compressor(encoding)
+    return compressor.compress(data) + compressor.flush()
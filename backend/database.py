@@ -0,0 +1,81 @@
+"""MongoDB client lifecycle.
+
+Clients are created when the app starts (see the lifespan handler in
+server.py) or on first use, never at import time, so modules that only need
+the models or the generator can be imported without MONGO_URL or a reachable
+server.
+
+Each named profile gets its own client, because network compression is a
+client-level setting. Pool settings are shared by all of them.
+"""
+import os
+from typing import Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+_clients: Dict[str, AsyncIOMotorClient] = {}
+_dbs: Dict[str, AsyncIOMotorDatabase] = {}
+
+
+def pool_options() -> dict:
+    """Connection pool settings, tunable through the environment"""
+    return {
+        "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+        "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+        "maxIdleTimeMS": int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '60000')),
+        "waitQueueTimeoutMS": int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '10000')),
+        "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '10000')),
+        "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000')),
+    }
+
+
+def profile_options(profile: str) -> dict:
+    """Write concern and wire options for a named profile.
+
+    "safe" keeps the driver and server defaults. "bulk-load" trades durability
+    for throughput on synthetic data: acknowledged by the primary only, no
+    journal wait, and compressed traffic.
+    """
+    if profile == "safe":
+        return {}
+    if profile == "bulk-load":
+        return {
+            "w": 1,
+            "journal": False,
+            "compressors": os.environ.get('MONGO_BULK_COMPRESSORS', 'zstd,zlib'),
+        }
+    raise ValueError(f"Unknown Mongo profile: {profile}")
+
+
+def default_profile() -> str:
+    return os.environ.get('MONGO_DEFAULT_PROFILE', 'safe')
+
+
+def connect(profile: Optional[str] = None) -> AsyncIOMotorDatabase:
+    """Create the client for `profile` if it does not exist yet and return the app database"""
+    profile = profile or default_profile()
+    if profile not in _dbs:
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'], **pool_options(), **profile_options(profile))
+        _clients[profile] = client
+        _dbs[profile] = client[os.environ['DB_NAME']]
+    return _dbs[profile]
+
+
+def use_client(client, db_name: str, profile: Optional[str] = None) -> AsyncIOMotorDatabase:
+    """Serve `profile` from an existing client, e.g. an in-memory stand-in for benchmarks"""
+    profile = profile or default_profile()
+    _clients[profile] = client
+    _dbs[profile] = client[db_name]
+    return _dbs[profile]
+
+
+def get_db(profile: Optional[str] = None) -> AsyncIOMotorDatabase:
+    db = _dbs.get(profile or default_profile())
+    return db if db is not None else connect(profile)
+
+
+def close_clients():
+    for client in _clients.values():
+        client.close()
+    _clients.clear()
+    _dbs.clear()
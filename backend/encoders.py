@@ -0,0 +1,43 @@
+"""Incremental text encoders shared by exports, streamed generation and the CLI"""
+import csv
+import io
+from typing import List
+
+import orjson
+
+from generation import TRANSACTION_FIELDS
+
+
+class RowEncoder:
+    """Incrementally encodes transaction dicts as a JSON array, NDJSON or CSV"""
+
+    def __init__(self, format: str):
+        self.format = format
+        self.first = True
+
+    def header(self) -> bytes:
+        if self.format == "json":
+            return b"["
+        if self.format == "csv":
+            output = io.StringIO()
+            csv.DictWriter(output, fieldnames=TRANSACTION_FIELDS).writeheader()
+            return output.getvalue().encode()
+        return b""
+
+    def encode(self, rows: List[dict]) -> bytes:
+        if not rows:
+            return b""
+        if self.format == "json":
+            chunk = b",\n".join(orjson.dumps(row) for row in rows)
+            chunk = (b"\n" if self.first else b",\n") + chunk
+        elif self.format == "ndjson":
+            chunk = b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+        else:
+            output = io.StringIO()
+            csv.DictWriter(output, fieldnames=TRANSACTION_FIELDS, extrasaction="ignore").writerows(rows)
+            chunk = output.getvalue().encode()
+        self.first = False
+        return chunk
+
+    def footer(self) -> bytes:
+        return b"\n]\n" if self.format == "json" else b""
@@ -0,0 +1,245 @@
+"""Entity pools: the people and merchants generated transactions are drawn from.
+
+A pool is built once from its own seed, so every process builds the same one,
+and is cached to disk as an .npz file that later processes load instead of
+rebuilding. Every person has one name and one email address, which no one else
+has, and every merchant has a unique id. Entities are shuffled when the pool is
+built and then sampled by rank with Zipf-like skew: a few payers and merchants
+account for much of the traffic and a long tail shows up rarely.
+
+Pool sizes, the pool seed, the skew and the cache location come from the
+ENTITY_* environment variables. Worker processes inherit them, so they sample
+from the same pool as the server.
+"""
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ENTITY_POOL_PEOPLE = int(os.environ.get('ENTITY_POOL_PEOPLE', '100000'))
+ENTITY_POOL_MERCHANTS = int(os.environ.get('ENTITY_POOL_MERCHANTS', '5000'))
+ENTITY_POOL_SEED = int(os.environ.get('ENTITY_POOL_SEED', '0'))
+
+# Zipf exponent of entity popularity; 0 samples uniformly, larger values concentrate on the top ranks
+ENTITY_ZIPF_EXPONENT = float(os.environ.get('ENTITY_ZIPF_EXPONENT', '0.9'))
+
+ENTITY_CACHE_DIR = Path(os.environ.get('ENTITY_CACHE_DIR', Path.home() / ".cache" / "transaction-generator"))
+
+# Bump when the way pools are built changes, so stale cache files are not loaded
+POOL_FORMAT_VERSION = 1
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Christopher", "Lisa", "Daniel", "Nancy", "Matthew", "Betty", "Anthony", "Margaret", "Mark", "Sandra",
+    "Donald", "Ashley", "Steven", "Kimberly", "Paul", "Emily", "Andrew", "Donna", "Joshua", "Michelle",
+    "Kenneth", "Carol", "Kevin", "Amanda", "Brian", "Dorothy", "George", "Melissa", "Timothy", "Deborah",
+    "Ronald", "Stephanie", "Jason", "Rebecca", "Edward", "Sharon", "Jeffrey", "Laura", "Ryan", "Cynthia",
+    "Jacob", "Amy", "Gary", "Kathleen", "Nicholas", "Angela", "Eric", "Shirley", "Jonathan", "Anna",
+    "Priya", "Wei", "Carlos", "Sofia", "Ahmed", "Yuki", "Olga", "Mateo", "Aisha", "Lucas"
+]
+
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores",
+    "Green", "Adams", "Nelson", "Baker", "Hall", "Rivera", "Campbell", "Mitchell", "Carter", "Roberts",
+    "Patel", "Chen", "Kim", "Singh", "Wang", "Kowalski", "Novak", "Rossi", "Schmidt", "Dubois",
+    "Silva", "Costa", "Ivanov", "Tanaka", "Okafor", "Haddad", "Larsen", "Murphy", "O'Brien", "Fischer"
+]
+
+EMAIL_DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com", "proton.me", "aol.com", "company.com"]
+EMAIL_DOMAIN_WEIGHTS = [0.38, 0.14, 0.14, 0.1, 0.1, 0.04, 0.03, 0.07]
+
+MERCHANT_WORDS = [
+    "Blue", "Summit", "Harbor", "Maple", "Urban", "Golden", "Silver", "Bright", "North", "Pixel",
+    "Cedar", "Atlas", "Nova", "Coastal", "Prime", "Swift", "Evergreen", "Iron", "Lumen", "Orchard"
+]
+
+MERCHANT_KINDS = [
+    "Electronics", "Books", "Apparel", "Software", "Coffee", "Games", "Studio", "Fitness", "Outfitters", "Media",
+    "Supply", "Market", "Labs", "Design", "Travel", "Pets", "Home", "Audio", "Print", "Academy"
+]
+
+MERCHANT_SUFFIXES = ["LLC", "Inc", "Co", "Ltd", "Shop", "Store"]
+
+
+def zipf_cdf(size: int, exponent: float) -> np.ndarray:
+    """Cumulative probabilities of ranks 0..size-1 under a Zipf law with the given exponent"""
+    weights = np.arange(1, size + 1, dtype=np.float64) ** -exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def sample_ranks(rng: np.random.Generator, cdf: np.ndarray, count: int) -> np.ndarray:
+    ranks = np.searchsorted(cdf, rng.random(count), side="right")
+    return np.minimum(ranks, len(cdf) - 1, out=ranks)
+
+
+def unique_emails(local_parts: list, domains: list) -> list:
+    """Join local parts and domains, numbering repeats so every address is distinct.
+
+    Local parts never end in a digit, so a numbered address cannot clash with another one.
+    """
+    seen: Dict[str, int] = {}
+    emails = []
+    for local, domain in zip(local_parts, domains):
+        address = f"{local}@{domain}"
+        repeats = seen.get(address, 0)
+        seen[address] = repeats + 1
+        emails.append(f"{local}{repeats + 1}@{domain}" if repeats else address)
+    return emails
+
+
+def build_people(rng: np.random.Generator, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    firsts = np.array(FIRST_NAMES, dtype=object)[rng.integers(0, len(FIRST_NAMES), size)]
+    lasts = np.array(LAST_NAMES, dtype=object)[rng.integers(0, len(LAST_NAMES), size)]
+    styles = rng.integers(0, 4, size).tolist()
+    domains = np.array(EMAIL_DOMAINS, dtype=object)[rng.choice(len(EMAIL_DOMAINS), size, p=EMAIL_DOMAIN_WEIGHTS)].tolist()
+
+    names = [f"{first} {last}" for first, last in zip(firsts.tolist(), lasts.tolist())]
+    local_parts = []
+    for first, last, style in zip(firsts.tolist(), lasts.tolist(), styles):
+        first, last = first.lower(), last.lower().replace("'", "")
+        local_parts.append((f"{first}.{last}", f"{first[0]}{last}", f"{first}{last[0]}", f"{first}_{last}")[style])
+    return np.array(names, dtype=object), np.array(unique_emails(local_parts, domains), dtype=object)
+
+
+def build_merchants(rng: np.random.Generator, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    words = np.array(MERCHANT_WORDS, dtype=object)[rng.integers(0, len(MERCHANT_WORDS), size)].tolist()
+    kinds = np.array(MERCHANT_KINDS, dtype=object)[rng.integers(0, len(MERCHANT_KINDS), size)].tolist()
+    suffixes = np.array(MERCHANT_SUFFIXES, dtype=object)[rng.integers(0, len(MERCHANT_SUFFIXES), size)].tolist()
+
+    ids = [f"MERCHANT{100000 + i}" for i in range(size)]
+    names = [f"{word} {kind} {suffix}" for word, kind, suffix in zip(words, kinds, suffixes)]
+    emails = unique_emails(["payments"] * size, [f"{word}{kind}.com".lower() for word, kind in zip(words, kinds)])
+    return np.array(ids, dtype=object), np.array(names, dtype=object), np.array(emails, dtype=object)
+
+
+class EntityPool:
+    """People and merchants as parallel arrays, indexed by popularity rank"""
+
+    def __init__(
+        self,
+        people_names: np.ndarray,
+        people_emails: np.ndarray,
+        merchant_ids: np.ndarray,
+        merchant_names: np.ndarray,
+        merchant_emails: np.ndarray,
+        exponent: float = ENTITY_ZIPF_EXPONENT
+    ):
+        self.people_names = people_names
+        self.people_emails = people_emails
+        self.merchant_ids = merchant_ids
+        self.merchant_names = merchant_names
+        self.merchant_emails = merchant_emails
+        self.people_cdf = zipf_cdf(len(people_names), exponent)
+        # One rank shorter, for picking a second person who differs from the first
+        self.other_people_cdf = zipf_cdf(len(people_names) - 1, exponent)
+        self.merchant_cdf = zipf_cdf(len(merchant_ids), exponent)
+
+    @classmethod
+    def build(cls, people: int, merchants: int, seed: int, exponent: float = ENTITY_ZIPF_EXPONENT) -> "EntityPool":
+        if people < 2 or merchants < 1:
+            raise ValueError("An entity pool needs at least two people and one merchant")
+        rng = np.random.default_rng(seed)
+        people_names, people_emails = build_people(rng, people)
+        merchant_ids, merchant_names, merchant_emails = build_merchants(rng, merchants)
+        # Shuffle so popularity rank is independent of how entities were built
+        people_order = rng.permutation(people)
+        merchant_order = rng.permutation(merchants)
+        return cls(
+            people_names[people_order], people_emails[people_order],
+            merchant_ids[merchant_order], merchant_names[merchant_order], merchant_emails[merchant_order],
+            exponent
+        )
+
+    def save(self, path: Path):
+        """Write the pool atomically, so concurrent processes never load a partial file"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f"{path.name}.{os.getpid()}.partial")
+        with open(partial, "wb") as output:
+            np.savez_compressed(
+                output,
+                people_names=self.people_names.astype(str),
+                people_emails=self.people_emails.astype(str),
+                merchant_ids=self.merchant_ids.astype(str),
+                merchant_names=self.merchant_names.astype(str),
+                merchant_emails=self.merchant_emails.astype(str)
+            )
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path: Path, exponent: float = ENTITY_ZIPF_EXPONENT) -> "EntityPool":
+        with np.load(path) as arrays:
+            return cls(
+                *(arrays[name].astype(object) for name in ("people_names", "people_emails", "merchant_ids", "merchant_names", "merchant_emails")),
+                exponent
+            )
+
+    def sample_people(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        return sample_ranks(rng, self.people_cdf, count)
+
+    def sample_distinct_people(self, rng: np.random.Generator, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Draw two people per row who are never the same person.
+
+        The second pick comes from the ranks that remain once the first is left
+        out, shifted past it, so no row ever needs a redraw.
+        """
+        first = sample_ranks(rng, self.people_cdf, count)
+        second = sample_ranks(rng, self.other_people_cdf, count)
+        second += second >= first
+        return first, second
+
+    def sample_merchants(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        return sample_ranks(rng, self.merchant_cdf, count)
+
+
+# Pools already loaded by this process, by (people, merchants, seed, exponent)
+_pools: Dict[tuple, EntityPool] = {}
+
+
+def pool_path(people: int, merchants: int, seed: int) -> Path:
+    return ENTITY_CACHE_DIR / f"entities-v{POOL_FORMAT_VERSION}-{seed}-{people}-{merchants}.npz"
+
+
+def get_pool(
+    people: Optional[int] = None,
+    merchants: Optional[int] = None,
+    seed: Optional[int] = None,
+    exponent: Optional[float] = None
+) -> EntityPool:
+    """The entity pool for the given configuration, defaulting to the ENTITY_* settings.
+
+    Loaded from the disk cache when present, built and cached otherwise, and
+    kept in memory for the rest of the process.
+    """
+    people = ENTITY_POOL_PEOPLE if people is None else people
+    merchants = ENTITY_POOL_MERCHANTS if merchants is None else merchants
+    seed = ENTITY_POOL_SEED if seed is None else seed
+    exponent = ENTITY_ZIPF_EXPONENT if exponent is None else exponent
+    key = (people, merchants, seed, exponent)
+    if key in _pools:
+        return _pools[key]
+
+    path = pool_path(people, merchants, seed)
+    pool = None
+    if path.exists():
+        try:
+            pool = EntityPool.load(path, exponent)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable entity pool cache {path}: {e}")
+    if pool is None:
+        pool = EntityPool.build(people, merchants, seed, exponent)
+        try:
+            pool.save(path)
+        except OSError as e:
+            logger.warning(f"Could not cache the entity pool at {path}: {e}")
+
+    _pools[key] = pool
+    return pool
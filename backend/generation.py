@@ -0,0 +1,487 @@
+"""Transaction generation.
+
+`generate_realistic_transaction` builds one validated model at a time. The
+batch generator produces the same distributions column by column as NumPy
+arrays and only turns them into Python dicts when they are serialized, which
+keeps the per-row cost down to the final conversion.
+
+Payers, recipients and merchants come from the shared entity pool (see
+`entities`). Every id of a row, its `id` UUID as well as its transaction and
+invoice ids, is keyed by the run's seed and the row's position in the run
+alone. Transaction ids never collide within or across runs, and rerunning a
+seed with a different count or different filters reproduces the ids it
+already stored, so the stores' unique index on `id` rejects the repeats.
+
+Nothing here touches the database, so worker processes and tools can import it
+without any server configuration.
+"""
+import random
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+
+from entities import EntityPool, get_pool
+from models import PayPalTransaction
+
+SAMPLE_DESCRIPTIONS = [
+    "Online Purchase - Electronics", "Digital Service Subscription", "Freelance Web Development",
+    "Online Course Payment", "E-commerce Store Purchase", "Consulting Services",
+    "Software License Fee", "Marketplace Commission", "Digital Download",
+    "Monthly Subscription", "Product Return Refund", "Service Cancellation"
+]
+
+TRANSACTION_TYPES = ["payment", "refund", "subscription", "dispute", "chargeback"]
+
+# Weighted status distribution (most transactions are completed)
+STATUS_WEIGHTS = {
+    "completed": 0.7,
+    "pending": 0.15,
+    "failed": 0.05,
+    "cancelled": 0.03,
+    "refunded": 0.04,
+    "disputed": 0.03
+}
+
+STATUSES = list(STATUS_WEIGHTS.keys())
+STATUS_CUMULATIVE = np.cumsum(list(STATUS_WEIGHTS.values())) / sum(STATUS_WEIGHTS.values())
+_STATUS_CUM_WEIGHTS = STATUS_CUMULATIVE.tolist()
+
+# Keys of a generated transaction document, in PayPalTransaction field order
+TRANSACTION_FIELDS = [
+    "id", "transaction_id", "transaction_type", "status", "amount", "currency", "fee", "net_amount",
+    "payer_email", "payer_name", "recipient_email", "recipient_name", "merchant_id", "description",
+    "invoice_id", "parent_transaction_id", "timestamp", "created_at"
+]
+
+# Spawn key separating the id key of a seed from its generation streams
+_ID_KEY_STREAM = 1
+
+# Rows per independently generated chunk of a seeded run. Part of the seed
+# contract: changing it changes what a given seed produces.
+SEED_CHUNK_SIZE = 1000
+
+# Typical PayPal fee: 2.9% + $0.30
+FEE_RATE = 0.029
+FEE_FIXED = 0.30
+
+_DESCRIPTIONS = np.array(SAMPLE_DESCRIPTIONS, dtype=object)
+_TYPES = np.array(TRANSACTION_TYPES, dtype=object)
+_STATUSES = np.array(STATUSES, dtype=object)
+
+
+def seed_prefix(seed: int) -> str:
+    """Fixed-width hex form of a run's seed; distinct seeds never share a prefix"""
+    return f"{seed:016X}"
+
+
+def transaction_ids(prefix: str, sequences) -> List[str]:
+    return [f"TXN{prefix}{sequence:08X}" for sequence in sequences]
+
+
+# SplitMix64 finalizer constants; the mix is a bijection on 64-bit words
+_MIX_MULTIPLIERS = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+_MIX_SHIFTS = (np.uint64(30), np.uint64(27), np.uint64(31))
+
+
+def _mix64(words: np.ndarray) -> np.ndarray:
+    words = (words ^ (words >> _MIX_SHIFTS[0])) * _MIX_MULTIPLIERS[0]
+    words = (words ^ (words >> _MIX_SHIFTS[1])) * _MIX_MULTIPLIERS[1]
+    return words ^ (words >> _MIX_SHIFTS[2])
+
+
+def _as_uuid4(raw: np.ndarray) -> np.ndarray:
+    """Stamp the version 4 and variant bits onto a (count, 16) byte matrix"""
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return raw
+
+
+def seeded_uuid_bytes(seed: int, sequences) -> np.ndarray:
+    """UUID4-shaped ids for rows `sequences` of the run `seed`, as a (count, 16) byte matrix.
+
+    Each half is a keyed mix of the sequence number, so an id depends on nothing
+    but (seed, sequence) and is as unlikely to collide as a random UUID4.
+    """
+    key = np.random.SeedSequence(seed, spawn_key=(_ID_KEY_STREAM,)).generate_state(2, np.uint64)
+    numbers = np.asarray(sequences, dtype=np.uint64)
+    halves = np.stack([_mix64(numbers ^ key[0]), _mix64(_mix64(numbers) ^ key[1])], axis=1)
+    return _as_uuid4(halves.astype(">u8").view(np.uint8).reshape(-1, 16))
+
+
+def format_uuids(id_bytes: np.ndarray) -> List[str]:
+    """Canonical UUID strings for a (count, 16) byte matrix"""
+    hexed = id_bytes.tobytes().hex()
+    return [
+        f"{hexed[i:i + 8]}-{hexed[i + 8:i + 12]}-{hexed[i + 12:i + 16]}-{hexed[i + 16:i + 20]}-{hexed[i + 20:i + 32]}"
+        for i in range(0, len(hexed), 32)
+    ]
+
+
+def _pick_rank(cdf: np.ndarray, rng: random.Random) -> int:
+    return min(bisect_right(cdf, rng.random()), len(cdf) - 1)
+
+
+def generate_realistic_transaction(
+    transaction_type: Optional[str] = None,
+    status: Optional[str] = None,
+    min_amount: float = 1.0,
+    max_amount: float = 1000.0,
+    currency: str = "USD",
+    days_back: int = 30,
+    rng: Optional[random.Random] = None,
+    now: Optional[datetime] = None
+) -> PayPalTransaction:
+    """Generate a single realistic PayPal transaction.
+
+    Pass a seeded `random.Random` as `rng` for reproducible output that does not
+    touch the global random state.
+    """
+    rng = rng if rng is not None else random
+    pool = get_pool()
+    
+    # Generate random amount
+    amount = round(rng.uniform(min_amount, max_amount), 2)
+    
+    # Calculate fee (typical PayPal fee: 2.9% + $0.30)
+    fee = round((amount * 0.029) + 0.30, 2)
+    net_amount = round(amount - fee, 2)
+    
+    # Generate random timestamp within the specified range
+    end_date = now or datetime.utcnow()
+    start_date = end_date - timedelta(days=days_back)
+    random_timestamp = start_date + timedelta(
+        seconds=rng.randint(0, int((end_date - start_date).total_seconds()))
+    )
+    
+    # Pick entities by popularity rank; the recipient skips over the payer's rank
+    payer = _pick_rank(pool.people_cdf, rng)
+    recipient = _pick_rank(pool.other_people_cdf, rng)
+    recipient += recipient >= payer
+    merchant = _pick_rank(pool.merchant_cdf, rng)
+    description = rng.choice(SAMPLE_DESCRIPTIONS)
+    
+    # Set transaction type and status
+    if not transaction_type:
+        transaction_type = rng.choice(TRANSACTION_TYPES)
+    
+    if not status:
+        status = rng.choices(STATUSES, cum_weights=_STATUS_CUM_WEIGHTS)[0]
+    
+    # Adjust amounts for refunds
+    if transaction_type == "refund":
+        amount = -abs(amount)
+        fee = -abs(fee)
+        net_amount = amount - fee
+    
+    # A lone transaction is a run of one under a random seed
+    seed = rng.getrandbits(63)
+    prefix = seed_prefix(seed)
+    return PayPalTransaction(
+        id=format_uuids(seeded_uuid_bytes(seed, [0]))[0],
+        transaction_id=f"TXN{prefix}{0:08X}",
+        merchant_id=pool.merchant_ids[merchant],
+        transaction_type=transaction_type,
+        status=status,
+        amount=amount,
+        currency=currency,
+        fee=fee,
+        net_amount=net_amount,
+        payer_email=pool.people_emails[payer],
+        payer_name=pool.people_names[payer],
+        recipient_email=pool.people_emails[recipient],
+        recipient_name=pool.people_names[recipient],
+        description=description,
+        invoice_id=f"INV-{prefix}-{0:08X}" if rng.random() > 0.5 else None,
+        timestamp=random_timestamp,
+        created_at=random_timestamp
+    )
+
+
+class TransactionBatch:
+    """A block of generated transactions stored as NumPy columns"""
+
+    def __init__(
+        self,
+        run_seed: int,
+        first_sequence: int,
+        type_codes: np.ndarray,
+        status_codes: np.ndarray,
+        amounts: np.ndarray,
+        fees: np.ndarray,
+        net_amounts: np.ndarray,
+        payer_indices: np.ndarray,
+        recipient_indices: np.ndarray,
+        merchant_indices: np.ndarray,
+        description_indices: np.ndarray,
+        has_invoice: np.ndarray,
+        timestamps: np.ndarray,
+        pool: EntityPool,
+        currency_codes: np.ndarray,
+        currencies: np.ndarray
+    ):
+        # Row i is number first_sequence + i of the run seeded run_seed, which keys all of its ids
+        self.run_seed = run_seed
+        self.first_sequence = first_sequence
+        self.type_codes = type_codes
+        self.status_codes = status_codes
+        self.amounts = amounts
+        self.fees = fees
+        self.net_amounts = net_amounts
+        self.payer_indices = payer_indices
+        self.recipient_indices = recipient_indices
+        self.merchant_indices = merchant_indices
+        self.description_indices = description_indices
+        self.has_invoice = has_invoice
+        self.timestamps = timestamps
+        self.pool = pool
+        # Row i is in currency currencies[currency_codes[i]]
+        self.currency_codes = currency_codes
+        self.currencies = currencies
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def to_documents(self) -> List[dict]:
+        """Materialize the batch as PayPalTransaction-shaped dicts"""
+        prefix = seed_prefix(self.run_seed)
+        sequences = range(self.first_sequence, self.first_sequence + len(self))
+        ids = format_uuids(seeded_uuid_bytes(self.run_seed, sequences))
+        invoice_ids = [
+            f"INV-{prefix}-{sequence:08X}" if invoiced else None
+            for sequence, invoiced in zip(sequences, self.has_invoice.tolist())
+        ]
+        pool = self.pool
+        timestamps = self.timestamps.astype("datetime64[us]").tolist()
+
+        columns = zip(
+            ids,
+            transaction_ids(prefix, sequences),
+            _TYPES[self.type_codes].tolist(),
+            _STATUSES[self.status_codes].tolist(),
+            self.amounts.tolist(),
+            self.currencies[self.currency_codes].tolist(),
+            self.fees.tolist(),
+            self.net_amounts.tolist(),
+            pool.people_emails[self.payer_indices].tolist(),
+            pool.people_names[self.payer_indices].tolist(),
+            pool.people_emails[self.recipient_indices].tolist(),
+            pool.people_names[self.recipient_indices].tolist(),
+            pool.merchant_ids[self.merchant_indices].tolist(),
+            _DESCRIPTIONS[self.description_indices].tolist(),
+            invoice_ids,
+            timestamps
+        )
+        return [
+            {
+                "id": id_,
+                "transaction_id": transaction_id,
+                "transaction_type": transaction_type,
+                "status": status,
+                "amount": amount,
+                "currency": currency,
+                "fee": fee,
+                "net_amount": net_amount,
+                "payer_email": payer_email,
+                "payer_name": payer_name,
+                "recipient_email": recipient_email,
+                "recipient_name": recipient_name,
+                "merchant_id": merchant_id,
+                "description": description,
+                "invoice_id": invoice_id,
+                "parent_transaction_id": None,
+                "timestamp": timestamp,
+                "created_at": timestamp
+            }
+            for (
+                id_, transaction_id, transaction_type, status, amount, currency, fee, net_amount,
+                payer_email, payer_name, recipient_email, recipient_name,
+                merchant_id, description, invoice_id, timestamp
+            ) in columns
+        ]
+
+
+def generate_transaction_batch(
+    count: int,
+    transaction_type: Optional[str] = None,
+    status: Optional[str] = None,
+    min_amount: float = 1.0,
+    max_amount: float = 1000.0,
+    currency: str = "USD",
+    days_back: int = 30,
+    rng: Optional[np.random.Generator] = None,
+    now: Optional[datetime] = None,
+    pool: Optional[EntityPool] = None,
+    run_seed: Optional[int] = None,
+    first_sequence: int = 0,
+    scenario: Optional[str] = None
+) -> TransactionBatch:
+    """Generate `count` realistic PayPal transactions at once.
+
+    Follows the same distributions as `generate_realistic_transaction`, unless a
+    `scenario` profile names others; its amounts, currencies and fees then replace
+    `min_amount`, `max_amount` and `currency`. Rows are numbered from
+    `first_sequence` within the run seeded `run_seed`; without one the batch is
+    a run of its own under a random seed.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    pool = pool if pool is not None else get_pool()
+    if run_seed is None:
+        run_seed = int(rng.integers(0, 2 ** 63))
+    end_date = now or datetime.utcnow()
+    start_date = end_date - timedelta(days=days_back)
+
+    if scenario is not None:
+        return _scenario_batch(
+            count, scenario, transaction_type, status, start_date, end_date, rng, pool, run_seed, first_sequence
+        )
+
+    amounts = np.round(rng.uniform(min_amount, max_amount, count), 2)
+    fees = np.round(amounts * FEE_RATE + FEE_FIXED, 2)
+
+    span_seconds = int((end_date - start_date).total_seconds())
+    offsets = rng.integers(0, span_seconds + 1, count).astype("timedelta64[s]")
+    timestamps = np.datetime64(start_date, "us") + offsets
+
+    payers, recipients = pool.sample_distinct_people(rng, count)
+    merchants = pool.sample_merchants(rng, count)
+    descriptions = rng.integers(0, len(SAMPLE_DESCRIPTIONS), count)
+
+    if transaction_type:
+        type_codes = np.full(count, TRANSACTION_TYPES.index(transaction_type), dtype=np.intp)
+    else:
+        type_codes = rng.integers(0, len(TRANSACTION_TYPES), count)
+
+    if status:
+        status_codes = np.full(count, STATUSES.index(status), dtype=np.intp)
+    else:
+        status_codes = np.searchsorted(STATUS_CUMULATIVE, rng.random(count), side="right")
+        np.minimum(status_codes, len(STATUSES) - 1, out=status_codes)
+
+    # Adjust amounts for refunds
+    refunds = type_codes == TRANSACTION_TYPES.index("refund")
+    amounts = np.where(refunds, -np.abs(amounts), amounts)
+    fees = np.where(refunds, -np.abs(fees), fees)
+    net_amounts = np.round(amounts - fees, 2)
+
+    has_invoice = rng.random(count) > 0.5
+
+    return TransactionBatch(
+        run_seed=run_seed,
+        first_sequence=first_sequence,
+        type_codes=type_codes,
+        status_codes=status_codes,
+        amounts=amounts,
+        fees=fees,
+        net_amounts=net_amounts,
+        payer_indices=payers,
+        recipient_indices=recipients,
+        merchant_indices=merchants,
+        description_indices=descriptions,
+        has_invoice=has_invoice,
+        timestamps=timestamps,
+        pool=pool,
+        currency_codes=np.zeros(count, dtype=np.intp),
+        currencies=np.array([currency], dtype=object)
+    )
+
+
+def _scenario_batch(
+    count: int,
+    scenario: str,
+    transaction_type: Optional[str],
+    status: Optional[str],
+    start_date: datetime,
+    end_date: datetime,
+    rng: np.random.Generator,
+    pool: EntityPool,
+    run_seed: int,
+    first_sequence: int
+) -> TransactionBatch:
+    from scenarios import get_scenario
+
+    compiled = get_scenario(scenario)
+
+    if transaction_type:
+        type_codes = np.full(count, TRANSACTION_TYPES.index(transaction_type), dtype=np.intp)
+    else:
+        type_codes = compiled.sample_types(rng, count)
+
+    if status:
+        status_codes = np.full(count, STATUSES.index(status), dtype=np.intp)
+    else:
+        status_codes = compiled.sample_statuses(rng, type_codes)
+
+    amounts = compiled.sample_amounts(rng, type_codes)
+    currency_codes = compiled.sample_currencies(rng, count)
+    fees = compiled.fees(amounts, currency_codes)
+    timestamps = compiled.sample_timestamps(rng, count, start_date, end_date)
+
+    payers, recipients = pool.sample_distinct_people(rng, count)
+    merchants = pool.sample_merchants(rng, count)
+    descriptions = rng.integers(0, len(SAMPLE_DESCRIPTIONS), count)
+
+    refunds = type_codes == TRANSACTION_TYPES.index("refund")
+    amounts = np.where(refunds, -np.abs(amounts), amounts)
+    fees = np.where(refunds, -np.abs(fees), fees)
+    net_amounts = np.round(amounts - fees, 2)
+
+    return TransactionBatch(
+        run_seed=run_seed,
+        first_sequence=first_sequence,
+        type_codes=type_codes,
+        status_codes=status_codes,
+        amounts=amounts,
+        fees=fees,
+        net_amounts=net_amounts,
+        payer_indices=payers,
+        recipient_indices=recipients,
+        merchant_indices=merchants,
+        description_indices=descriptions,
+        has_invoice=rng.random(count) > 0.5,
+        timestamps=timestamps,
+        pool=pool,
+        currency_codes=currency_codes,
+        currencies=compiled.currencies
+    )
+
+
+def new_seed() -> int:
+    """Fresh 63-bit seed from OS entropy, for runs that did not ask for one"""
+    return int(np.random.SeedSequence().generate_state(1, np.uint64)[0] >> np.uint64(1))
+
+
+def chunk_rng(seed: int, chunk_index: int, stream: int = 0) -> np.random.Generator:
+    """Counter-based stream for chunk `chunk_index` of a seeded run.
+
+    The seed fixes the Philox key and the chunk index selects a disjoint block
+    of counter space, so any chunk can be generated on its own, in any process,
+    and still match a sequential run. Other `stream`s give a chunk further
+    independent randomness without disturbing the rows of stream 0.
+    """
+    key = np.random.SeedSequence(seed).generate_state(2, np.uint64)
+    return np.random.Generator(np.random.Philox(counter=[0, 0, stream, chunk_index], key=key))
+
+
+def seeded_chunk_count(count: int) -> int:
+    return -(-count // SEED_CHUNK_SIZE)
+
+
+def generate_seeded_chunk(seed: int, chunk_index: int, count: int, now: datetime, **params) -> TransactionBatch:
+    """Generate chunk `chunk_index` of a seeded run of `count` transactions.
+
+    `params` are forwarded to `generate_transaction_batch`. Every chunk of a run
+    must share the same `now` for the output to be reproducible.
+    """
+    first_sequence = chunk_index * SEED_CHUNK_SIZE
+    size = min(SEED_CHUNK_SIZE, count - first_sequence)
+    return generate_transaction_batch(
+        size, rng=chunk_rng(seed, chunk_index), now=now,
+        run_seed=seed, first_sequence=first_sequence, **params
+    )
+
+
+def generate_seeded_documents(seed: int, chunk_index: int, count: int, now: datetime, params: dict) -> List[dict]:
+    """Process pool entry point: one seeded chunk, already converted to documents"""
+    return generate_seeded_chunk(seed, chunk_index, count, now, **params).to_documents()
@@ -0,0 +1,163 @@
+"""In-process background jobs with progress tracking and cancellation.
+
+Jobs wait in a bounded queue and are run by a fixed number of worker tasks, so
+a burst of submissions is rejected instead of piling up unbounded work.
+"""
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = {"completed", "failed", "cancelled"}
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    def __init__(self, request: Any, total: int, unit: str = "transactions"):
+        self.id = str(uuid.uuid4())
+        self.request = request
+        self.status = "queued"
+        # Progress toward `total` is counted in `unit`, e.g. payments for lifecycle runs
+        self.unit = unit
+        self.total = total
+        self.generated = 0
+        # Documents, which a unit may span several of
+        self.generated_rows = 0
+        self.persisted = 0
+        self.failed = 0
+        self.error: Optional[str] = None
+        self.result: dict = {}
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def update(self, **fields):
+        """Apply progress fields and wake up anyone following the job"""
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def snapshot(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "unit": self.unit,
+            "total": self.total,
+            "generated": self.generated,
+            "generated_rows": self.generated_rows,
+            "persisted": self.persisted,
+            "failed": self.failed,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+    async def follow(self, min_interval: float = 0.0) -> AsyncIterator[dict]:
+        """Yield a snapshot now and after every change until the job finishes"""
+        while True:
+            changed = self._changed
+            yield self.snapshot()
+            if self.finished:
+                return
+            await changed.wait()
+            if min_interval:
+                await asyncio.sleep(min_interval)
+
+
+class JobManager:
+    """Runs jobs on `workers` tasks fed by a queue holding at most `queue_size` jobs"""
+
+    def __init__(
+        self,
+        runner: Callable[[Job], Awaitable[None]],
+        workers: int = 2,
+        queue_size: int = 16,
+        history_limit: int = 100
+    ):
+        self.runner = runner
+        self.worker_count = workers
+        self.history_limit = history_limit
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.workers = []
+
+    def start(self):
+        self.workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        for job in self.jobs.values():
+            if not job.finished:
+                self.cancel(job.id)
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def submit(self, request: Any, total: int, unit: str = "transactions") -> Job:
+        job = Job(request, total, unit)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Job queue is full ({self.queue.maxsize} waiting)")
+        self.jobs[job.id] = job
+        self._trim_history()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            # Still queued: the worker skips it when it comes up
+            job.update(status="cancelled", finished_at=datetime.utcnow())
+        return job
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self.jobs) - self.history_limit)]:
+            del self.jobs[job_id]
+
+    async def _work(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.finished:
+                    continue
+                job.update(status="running", started_at=datetime.utcnow())
+                job.task = asyncio.create_task(self.runner(job))
+                try:
+                    await job.task
+                    job.update(status="completed", finished_at=datetime.utcnow())
+                except asyncio.CancelledError:
+                    if not job.task.cancelled():
+                        # The worker itself is being cancelled
+                        job.task.cancel()
+                        job.update(status="cancelled", finished_at=datetime.utcnow())
+                        raise
+                    job.update(status="cancelled", finished_at=datetime.utcnow())
+                except Exception as e:
+                    logger.exception(f"Job {job.id} failed")
+                    job.update(status="failed", error=str(e), finished_at=datetime.utcnow())
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,201 @@
+"""Payment lifecycles: payments followed by the refunds, disputes and chargebacks they lead to.
+
+A lifecycle run of `count` payments is split into seeded chunks like any other
+run, but chunk k's payments all fall in the k-th slice of the time window, in
+timestamp order. A completed payment may be followed by a partial or full
+refund or by a dispute, and a dispute by a chargeback. Each follow-up is
+generated together with its payment, keeps its parties and currency, and
+points back through `parent_transaction_id`. Follow-ups that would happen
+after the reference time are left out, as lifecycles still open.
+
+`LifecycleMerger` joins chunks into one stream in timestamp order. Its heap
+only holds follow-ups that are not due yet, so memory grows with the number of
+open lifecycles, not with the size of the run.
+"""
+import heapq
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from generation import (
+    STATUSES, chunk_rng, format_uuids, generate_seeded_chunk, seed_prefix, seeded_chunk_count,
+    seeded_uuid_bytes, transaction_ids
+)
+from models import MAX_RUN_COUNT
+
+# Chance that a completed payment is followed by each outcome; the rest have no follow-up
+LIFECYCLE_OUTCOMES = {"partial_refund": 0.05, "full_refund": 0.04, "dispute": 0.03}
+OUTCOME_CUMULATIVE = np.cumsum(list(LIFECYCLE_OUTCOMES.values()))
+PARTIAL_REFUND, FULL_REFUND, DISPUTE = range(3)
+
+# Share of disputes the buyer wins, ending in a chargeback
+CHARGEBACK_RATE = 0.45
+CHARGEBACK_FEE = 20.0
+
+# Delay after the parent event in days, as (median, sigma) of a lognormal
+REFUND_DELAY_DAYS = (3.0, 0.9)
+DISPUTE_DELAY_DAYS = (12.0, 0.6)
+CHARGEBACK_DELAY_DAYS = (9.0, 0.5)
+
+# Follow-ups number their ids from here, past any payment of the run and within 8 hex digits
+FOLLOW_UP_SEQUENCE_BASE = MAX_RUN_COUNT
+
+_COMPLETED = STATUSES.index("completed")
+# Statuses only a follow-up may give a payment
+_OUTCOME_STATUSES = [STATUSES.index("refunded"), STATUSES.index("disputed")]
+
+
+def chunk_window(count: int, now: datetime, days_back: int, chunk_index: int) -> Tuple[datetime, datetime]:
+    """The slice of the time window that chunk `chunk_index` places its payments in"""
+    start = now - timedelta(days=days_back)
+    width = timedelta(days=days_back) / seeded_chunk_count(count)
+    return start + width * chunk_index, start + width * (chunk_index + 1)
+
+
+def _delays(rng: np.random.Generator, count: int, delay: Tuple[float, float]) -> np.ndarray:
+    median, sigma = delay
+    seconds = rng.lognormal(np.log(median * 86400), sigma, count)
+    return seconds.astype(np.int64).astype("timedelta64[s]")
+
+
+def _follow_up(parent: dict, id_: str, transaction_id: str, timestamp: datetime, **fields) -> dict:
+    document = {
+        **parent,
+        "id": id_,
+        "transaction_id": transaction_id,
+        "invoice_id": None,
+        "parent_transaction_id": parent["transaction_id"],
+        "timestamp": timestamp,
+        "created_at": timestamp,
+        **fields
+    }
+    document.pop("_id", None)
+    return document
+
+
+def generate_lifecycle_chunk(seed: int, chunk_index: int, count: int, now: datetime, params: dict) -> Tuple[List[dict], List[dict]]:
+    """Chunk `chunk_index` of a seeded lifecycle run of `count` payments.
+
+    Returns the payments in timestamp order and their follow-ups in no
+    particular order. Payments are the rows a plain run of the same seed would
+    produce, typed as payments and re-timed into the chunk's slice; unless a
+    status is requested, only their follow-ups mark them refunded or disputed.
+    """
+    days_back = params.get("days_back", 30)
+    batch = generate_seeded_chunk(seed, chunk_index, count, now, **{**params, "transaction_type": "payment"})
+    size = len(batch)
+    rng = chunk_rng(seed, chunk_index, stream=1)
+
+    slice_start, slice_end = chunk_window(count, now, days_back, chunk_index)
+    slice_seconds = (slice_end - slice_start).total_seconds()
+    offsets = (np.sort(rng.random(size)) * slice_seconds * 1e6).astype(np.int64).astype("timedelta64[us]")
+    batch.timestamps = np.datetime64(slice_start, "us") + offsets
+    if params.get("status") is None:
+        batch.status_codes[np.isin(batch.status_codes, _OUTCOME_STATUSES)] = _COMPLETED
+
+    outcomes = np.searchsorted(OUTCOME_CUMULATIVE, rng.random(size), side="right")
+    outcomes[batch.status_codes != _COMPLETED] = len(LIFECYCLE_OUTCOMES)
+    refund_shares = np.round(rng.uniform(0.1, 0.9, size), 2)
+    charged_back = rng.random(size) < CHARGEBACK_RATE
+    first_delays = np.where(
+        outcomes == DISPUTE, _delays(rng, size, DISPUTE_DELAY_DAYS), _delays(rng, size, REFUND_DELAY_DAYS)
+    )
+    chargeback_delays = _delays(rng, size, CHARGEBACK_DELAY_DAYS)
+    # Each payment reserves two follow-up sequences, used or not, so ids never depend on other rows
+    first_follow_up = FOLLOW_UP_SEQUENCE_BASE + 2 * batch.first_sequence
+    follow_up_ids = format_uuids(seeded_uuid_bytes(seed, np.arange(first_follow_up, first_follow_up + 2 * size)))
+
+    payments = batch.to_documents()
+    prefix = seed_prefix(seed)
+    limit = np.datetime64(now, "us")
+    follow_ups = []
+    for row in np.flatnonzero(outcomes < len(LIFECYCLE_OUTCOMES)).tolist():
+        payment = payments[row]
+        first_at = batch.timestamps[row] + first_delays[row]
+        if first_at > limit:
+            continue
+        sequence = FOLLOW_UP_SEQUENCE_BASE + 2 * (batch.first_sequence + row)
+        event_ids = transaction_ids(prefix, (sequence, sequence + 1))
+        outcome = outcomes[row]
+
+        if outcome == DISPUTE:
+            dispute = _follow_up(
+                payment, follow_up_ids[2 * row], event_ids[0], first_at.item(),
+                transaction_type="dispute", status="disputed", fee=0.0, net_amount=payment["amount"],
+                description="Buyer Dispute"
+            )
+            payment["status"] = "disputed"
+            follow_ups.append(dispute)
+
+            chargeback_at = first_at + chargeback_delays[row]
+            if charged_back[row] and chargeback_at <= limit:
+                amount = -payment["amount"]
+                follow_ups.append(_follow_up(
+                    dispute, follow_up_ids[2 * row + 1], event_ids[1], chargeback_at.item(),
+                    transaction_type="chargeback", status="completed", amount=amount, fee=CHARGEBACK_FEE,
+                    net_amount=round(amount - CHARGEBACK_FEE, 2), description="Chargeback"
+                ))
+            continue
+
+        share = 1.0 if outcome == FULL_REFUND else float(refund_shares[row])
+        amount = -round(payment["amount"] * share, 2)
+        fee = -round(payment["fee"] * share, 2)
+        follow_ups.append(_follow_up(
+            payment, follow_up_ids[2 * row], event_ids[0], first_at.item(),
+            transaction_type="refund", status="completed", amount=amount, fee=fee,
+            net_amount=round(amount - fee, 2), description="Product Return Refund"
+        ))
+        if outcome == FULL_REFUND:
+            payment["status"] = "refunded"
+
+    return payments, follow_ups
+
+
+class LifecycleMerger:
+    """Interleaves lifecycle chunks, taken in order, into one timestamp-ordered stream"""
+
+    def __init__(self, count: int, now: datetime, days_back: int, first_chunk: int = 0):
+        self.count = count
+        self.now = now
+        self.days_back = days_back
+        self.chunk_index = first_chunk
+        self.last_chunk = seeded_chunk_count(count) - 1
+        # Follow-ups not emitted yet, keyed by (timestamp, transaction_id)
+        self.open: List[Tuple[datetime, str, dict]] = []
+
+    def __len__(self) -> int:
+        return len(self.open)
+
+    def _due(self, until: Optional[datetime], inclusive: bool) -> List[dict]:
+        due = []
+        while self.open and (until is None or self.open[0][0] < until or (inclusive and self.open[0][0] == until)):
+            due.append(heapq.heappop(self.open)[2])
+        return due
+
+    def merge(self, payments: List[dict], follow_ups: List[dict]) -> List[dict]:
+        """Events of the next chunk plus earlier follow-ups, up to the start of the following chunk"""
+        for event in follow_ups:
+            heapq.heappush(self.open, (event["timestamp"], event["transaction_id"], event))
+
+        events = []
+        for payment in payments:
+            events += self._due(payment["timestamp"], inclusive=True)
+            events.append(payment)
+
+        # Later chunks only hold events from the next slice on, so everything before it is final
+        until = None
+        if self.chunk_index < self.last_chunk:
+            until = chunk_window(self.count, self.now, self.days_back, self.chunk_index + 1)[0]
+        events += self._due(until, inclusive=False)
+        self.chunk_index += 1
+        return events
+
+    def drain(self) -> List[dict]:
+        """Every follow-up still held, for a caller that stops before the run's last chunk"""
+        return self._due(None, inclusive=False)
+
+
+def count_lifecycles(documents: List[dict]) -> int:
+    """Payments among a batch of lifecycle events, i.e. lifecycles started"""
+    return sum(document["parent_transaction_id"] is None for document in documents)
@@ -0,0 +1,284 @@
+"""Drive the API with concurrent virtual clients and report latency percentiles.
+
+    python backend/loadtest.py --base-url http://localhost:8001/api --clients 50 --duration 60
+    python backend/loadtest.py --in-process --profile write-heavy --requests 2000
+
+Each virtual client loops: pick an endpoint from the request mix, send the
+request, record its latency and outcome, optionally pause. Responses are read
+to the end, so streamed exports count their full transfer time. The summary
+lists throughput, error rate and p50/p95/p99 latency per endpoint.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+# Relative weights of each endpoint in a named request mix
+MIX_PROFILES = {
+    "balanced": {"generate": 2, "list": 5, "stats": 2, "export": 1},
+    "read-heavy": {"generate": 1, "list": 12, "stats": 6, "export": 1},
+    "write-heavy": {"generate": 8, "list": 3, "stats": 1, "export": 0},
+    "export": {"generate": 1, "list": 1, "stats": 1, "export": 7},
+}
+
+ENDPOINTS = ["generate", "list", "stats", "export"]
+
+
+def parse_mix(value: str) -> dict:
+    """Parse `generate=2,list=5,...` into endpoint weights"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name!r}, expected one of {', '.join(ENDPOINTS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight for {name}: {weight!r}")
+    return mix
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_kinds = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, endpoint: str, seconds: float, error: str = None):
+        self.latencies[endpoint].append(seconds)
+        if error:
+            self.errors[endpoint] += 1
+            self.error_kinds[endpoint][error] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(len(samples) for samples in self.latencies.values())
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            samples = sorted(self.latencies.get(endpoint, []))
+            if not samples:
+                continue
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / len(samples),
+                "error_kinds": dict(self.error_kinds[endpoint]),
+                "throughput_rps": len(samples) / elapsed,
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p95_ms": percentile(samples, 0.95) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+                "max_ms": samples[-1] * 1000,
+            }
+        errors = sum(self.errors.values())
+        return {
+            "elapsed_seconds": elapsed,
+            "requests": self.total,
+            "errors": errors,
+            "error_rate": errors / self.total if self.total else 0.0,
+            "throughput_rps": self.total / elapsed if elapsed else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+class VirtualClient:
+    """One simulated user; list requests page forward with the cursor until they run out"""
+
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.cursor = None
+
+    async def generate(self):
+        return await self.client.post("/transactions/generate", json={"count": self.args.generate_count})
+
+    async def list(self):
+        params = {"limit": self.args.page_size}
+        if self.cursor:
+            params["cursor"] = self.cursor
+        response = await self.client.get("/transactions", params=params)
+        self.cursor = response.headers.get("X-Next-Cursor")
+        return response
+
+    async def stats(self):
+        return await self.client.get("/transactions/stats")
+
+    async def export(self):
+        async with self.client.stream("POST", "/transactions/export", json={"format": self.args.export_format}) as response:
+            async for _ in response.aiter_raw():
+                pass
+        return response
+
+    async def request(self, endpoint: str) -> str:
+        """Send one request, returning an error label or None on success"""
+        try:
+            response = await getattr(self, endpoint)()
+        except httpx.TimeoutException:
+            return "timeout"
+        except httpx.HTTPError as e:
+            return type(e).__name__
+        if response.status_code >= 400:
+            return f"http_{response.status_code}"
+        return None
+
+
+async def run_client(client_id: int, client: httpx.AsyncClient, args, mix: dict, recorder: Recorder, deadline: float, budget: list):
+    rng = random.Random(args.seed * 100003 + client_id if args.seed is not None else None)
+    user = VirtualClient(client, args)
+    endpoints = [endpoint for endpoint in mix if mix[endpoint] > 0]
+    weights = [mix[endpoint] for endpoint in endpoints]
+
+    while time.perf_counter() < deadline:
+        if budget is not None:
+            if budget[0] <= 0:
+                return
+            budget[0] -= 1
+        endpoint = rng.choices(endpoints, weights)[0]
+        started = time.perf_counter()
+        error = await user.request(endpoint)
+        recorder.record(endpoint, time.perf_counter() - started, error)
+        if args.think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * args.think_time))
+
+
+async def report_progress(recorder: Recorder, interval: float = 1.0):
+    while True:
+        await asyncio.sleep(interval)
+        elapsed = time.perf_counter() - recorder.started
+        errors = sum(recorder.errors.values())
+        sys.stderr.write(f"\r{recorder.total:,} requests, {errors:,} errors, {recorder.total / elapsed:,.1f} req/s".ljust(70))
+        sys.stderr.flush()
+
+
+async def prefill(client: httpx.AsyncClient, rows: int):
+    """Store `rows` transactions first, so reads have something to page through"""
+    while rows > 0:
+        count = min(rows, 1000)
+        response = await client.post("/transactions/generate", json={"count": count})
+        response.raise_for_status()
+        rows -= count
+
+
+def make_client(args) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    timeout = httpx.Timeout(args.timeout)
+    if not args.in_process:
+        return httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout)
+
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'loadtest')
+    from benchmark import use_test_store
+
+    import server
+
+    use_test_store(args.backend)
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=server.app), base_url="http://loadtest/api", limits=limits, timeout=timeout
+    )
+
+
+async def run(args, mix: dict) -> dict:
+    async with make_client(args) as client:
+        if args.prefill:
+            sys.stderr.write(f"Prefilling {args.prefill:,} transactions\n")
+            await prefill(client, args.prefill)
+
+        recorder = Recorder()
+        deadline = recorder.started + args.duration if args.duration else float("inf")
+        # Shared countdown of requests left when a fixed request count is asked for
+        budget = [args.requests] if args.requests else None
+        progress = asyncio.create_task(report_progress(recorder))
+        try:
+            await asyncio.gather(*(
+                run_client(client_id, client, args, mix, recorder, deadline, budget)
+                for client_id in range(args.clients)
+            ))
+        finally:
+            progress.cancel()
+            recorder.finished = time.perf_counter()
+            sys.stderr.write("\n")
+    return recorder.summary()
+
+
+def print_summary(summary: dict):
+    print(f"{'endpoint':<10} {'requests':>9} {'errors':>7} {'err %':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, stats in summary["endpoints"].items():
+        print(
+            f"{endpoint:<10} {stats['requests']:>9,} {stats['errors']:>7,} {stats['error_rate'] * 100:>6.2f} "
+            f"{stats['throughput_rps']:>8.1f} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}"
+        )
+    print(
+        f"{'total':<10} {summary['requests']:>9,} {summary['errors']:>7,} {summary['error_rate'] * 100:>6.2f} "
+        f"{summary['throughput_rps']:>8.1f}   in {summary['elapsed_seconds']:.1f}s"
+    )
+    for endpoint, stats in summary["endpoints"].items():
+        for kind, count in stats["error_kinds"].items():
+            print(f"  {endpoint}: {count:,} x {kind}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load test the transaction API with concurrent virtual clients")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", default="http://localhost:8001/api", help="API root of a running server")
+    target.add_argument("--in-process", action="store_true", help="run the app in this process against in-process storage")
+    parser.add_argument("--backend", choices=["mongomock", "memory"], default="mongomock", help="storage for --in-process runs")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent virtual clients")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to run (default: 30 unless --requests is given)")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many requests in total")
+    parser.add_argument("--profile", choices=sorted(MIX_PROFILES), default="balanced", help="named request mix")
+    parser.add_argument("--mix", type=parse_mix, default=None, help="custom weights, e.g. generate=1,list=8,stats=1")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause in seconds between a client's requests")
+    parser.add_argument("--generate-count", type=int, default=10, help="rows per generate request")
+    parser.add_argument("--page-size", type=int, default=50, help="rows per list request")
+    parser.add_argument("--export-format", choices=["json", "csv", "ndjson"], default="csv")
+    parser.add_argument("--prefill", type=int, default=0, help="transactions to store before the run starts")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=None, help="seed the request sequence for repeatable runs")
+    parser.add_argument("--output", default=None, help="also write the summary as JSON here")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.clients < 1:
+        sys.exit("--clients must be at least 1")
+    if args.duration is None and args.requests is None:
+        args.duration = 30.0
+
+    mix = args.mix or MIX_PROFILES[args.profile]
+    if not any(weight > 0 for weight in mix.values()):
+        sys.exit("The request mix needs at least one endpoint with a positive weight")
+
+    summary = asyncio.run(run(args, mix))
+    summary["parameters"] = {**vars(args), "mix": mix}
+    print_summary(summary)
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2))
+    return 1 if summary["requests"] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
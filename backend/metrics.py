@@ -0,0 +1,89 @@
+"""Prometheus metrics for the generation, query and export hot paths.
+
+Everything is observed per chunk, batch or request rather than per row, so the
+overhead stays negligible with metrics left on in production.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterable, AsyncIterator
+
+from prometheus_client import Counter, Histogram
+
+GENERATE_PHASE_SECONDS = Histogram(
+    "txgen_generate_phase_seconds",
+    "Time spent per chunk generating rows or persisting them",
+    ["phase"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+GENERATE_REQUEST_SECONDS = Histogram(
+    "txgen_generate_request_seconds",
+    "End-to-end duration of generation requests and jobs",
+    ["endpoint"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800, 3600)
+)
+GENERATE_ROWS_PER_SECOND = Histogram(
+    "txgen_generate_rows_per_second",
+    "Overall throughput of each generation request or job",
+    ["endpoint"],
+    buckets=(100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000, 5000000)
+)
+GENERATED_ROWS = Counter("txgen_generated_rows_total", "Transactions generated", ["endpoint"])
+PERSISTED_ROWS = Counter("txgen_persisted_rows_total", "Transactions written to Mongo")
+FAILED_ROWS = Counter("txgen_failed_rows_total", "Transactions that failed to be written to Mongo")
+
+MONGO_OPERATION_SECONDS = Histogram(
+    "txgen_mongo_operation_seconds",
+    "Latency of Mongo operations by endpoint",
+    ["endpoint", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+STREAMED_BYTES = Counter("txgen_streamed_bytes_total", "Response bytes streamed, after compression", ["endpoint", "format"])
+STREAMED_ROWS = Counter("txgen_streamed_rows_total", "Rows streamed", ["endpoint", "format"])
+
+STATS_CACHE_REQUESTS = Counter("txgen_stats_cache_requests_total", "Stats requests by cache outcome", ["result"])
+
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "txgen_event_loop_lag_seconds",
+    "How late the event loop wakes up a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+
+# Endpoint label for Mongo timings; set by each handler and inherited by the tasks it spawns
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="internal")
+
+
+@contextmanager
+def track_mongo(operation: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        MONGO_OPERATION_SECONDS.labels(current_endpoint.get(), operation).observe(time.perf_counter() - started)
+
+
+def observe_generation(endpoint: str, rows: int, seconds: float):
+    GENERATED_ROWS.labels(endpoint).inc(rows)
+    GENERATE_REQUEST_SECONDS.labels(endpoint).observe(seconds)
+    if seconds > 0:
+        GENERATE_ROWS_PER_SECOND.labels(endpoint).observe(rows / seconds)
+
+
+async def count_streamed_bytes(chunks: AsyncIterable, endpoint: str, format: str) -> AsyncIterator:
+    """Pass a response body through, counting the bytes that go out"""
+    counter = STREAMED_BYTES.labels(endpoint, format)
+    async for chunk in chunks:
+        counter.inc(len(chunk))
+        yield chunk
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Record how far past `interval` each wake-up lands, until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - started - interval))
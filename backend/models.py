@@ -0,0 +1,115 @@
+"""Pydantic models for transactions and API requests"""
+import os
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+# Rows in one seeded run. Ids number rows in 8 hex digits, and lifecycle
+# follow-ups take the sequences from here up, two per payment
+MAX_RUN_COUNT = 1 << 30
+
+# Largest count accepted by background jobs and streamed generation
+MAX_JOB_COUNT = min(int(os.environ.get('MAX_JOB_COUNT', '100000000')), MAX_RUN_COUNT)
+
+# Seeds render as 16 hex digits in transaction and invoice ids, see generation.seed_prefix
+MAX_SEED = 2**64 - 1
+
+# Mongo's duplicate key error, which the memory backend reuses, and PostgreSQL's unique_violation
+DUPLICATE_KEY_CODES = {11000, "23505"}
+
+# Named Mongo client profiles, see database.profile_options
+MongoProfile = Literal["safe", "bulk-load"]
+
+# Transaction Models
+class PayPalTransaction(BaseModel):
+    # Ids and timestamps have no defaults: they come from the (seeded) generator, never from global state
+    id: str
+    transaction_id: str
+    transaction_type: Literal["payment", "refund", "subscription", "dispute", "chargeback"] = "payment"
+    status: Literal["completed", "pending", "failed", "cancelled", "refunded", "disputed"] = "completed"
+    amount: float
+    currency: str = "USD"
+    fee: float = 0.0
+    net_amount: float = 0.0
+    payer_email: str
+    payer_name: str
+    recipient_email: str
+    recipient_name: str
+    merchant_id: str
+    description: str
+    invoice_id: Optional[str] = None
+    parent_transaction_id: Optional[str] = Field(default=None, description="transaction_id of the event this one follows in a lifecycle")
+    timestamp: datetime
+    created_at: datetime
+
+class TransactionGenerateRequest(BaseModel):
+    count: int = Field(default=10, ge=1, le=1000)
+    transaction_type: Optional[Literal["payment", "refund", "subscription", "dispute", "chargeback"]] = None
+    status: Optional[Literal["completed", "pending", "failed", "cancelled", "refunded", "disputed"]] = None
+    min_amount: float = Field(default=1.0, ge=0.01)
+    max_amount: float = Field(default=1000.0, ge=0.01)
+    currency: str = "USD"
+    days_back: int = Field(default=30, ge=1, le=365)
+    scenario: Optional[str] = Field(default=None, description="Scenario profile whose distributions replace the amount range and currency")
+    lifecycles: bool = Field(default=False, description="Generate `count` payment lifecycles: each payment followed by any refund, dispute and chargeback that link back to it")
+    seed: Optional[int] = Field(default=None, ge=0, le=MAX_SEED, description="Same seed and parameters produce the same transactions")
+    reference_time: Optional[datetime] = Field(default=None, description="End of the timestamp window, defaults to now; fix it to reproduce a seeded run exactly")
+    db_profile: Optional[MongoProfile] = Field(default=None, description="Mongo write profile; 'bulk-load' skips journal waits and compresses traffic")
+
+    @model_validator(mode="after")
+    def check_amount_range(self):
+        if self.max_amount < self.min_amount:
+            raise ValueError("max_amount must not be less than min_amount")
+        return self
+
+    def generation_params(self) -> dict:
+        return {
+            "transaction_type": self.transaction_type,
+            "status": self.status,
+            "min_amount": self.min_amount,
+            "max_amount": self.max_amount,
+            "currency": self.currency,
+            "days_back": self.days_back,
+            "scenario": self.scenario
+        }
+
+    def resolved_reference_time(self) -> datetime:
+        if self.reference_time is None:
+            return datetime.utcnow()
+        if self.reference_time.tzinfo is not None:
+            return self.reference_time.astimezone(timezone.utc).replace(tzinfo=None)
+        return self.reference_time
+
+class GenerationJobRequest(TransactionGenerateRequest):
+    count: int = Field(default=100000, ge=1, le=MAX_JOB_COUNT)
+
+class TransactionStreamRequest(TransactionGenerateRequest):
+    count: int = Field(default=1000, ge=1, le=MAX_JOB_COUNT)
+    format: Literal["ndjson", "csv"] = "ndjson"
+    rate: Optional[float] = Field(default=None, gt=0, description="Maximum rows per second; unlimited when omitted")
+    persist: bool = Field(default=False, description="Also save the streamed transactions to the database")
+
+class BulkInsertReport(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: List[dict] = []
+
+    def add(self, other: "BulkInsertReport"):
+        self.inserted += other.inserted
+        self.failed += other.failed
+        self.errors.extend(other.errors)
+
+    def has_duplicates(self) -> bool:
+        """Some rows already existed, as when a seed is generated again"""
+        return any(error.get("code") in DUPLICATE_KEY_CODES for error in self.errors)
+
+class BulkExportRequest(BaseModel):
+    format: Literal["json", "csv", "ndjson", "parquet", "arrow"] = "json"
+    codec: Optional[Literal["none", "snappy", "gzip", "zstd", "lz4"]] = Field(default=None, description="Internal compression for parquet/arrow exports")
+    compression: Optional[Literal["none", "gzip", "zstd"]] = Field(default=None, description="Download a compressed file; when omitted, Accept-Encoding decides the transfer encoding")
+    db_profile: Optional[MongoProfile] = Field(default=None, description="Mongo client profile to read the export through")
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    transaction_type: Optional[str] = None
+    status: Optional[str] = None
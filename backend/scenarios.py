@@ -0,0 +1,291 @@
+"""Scenario profiles: named YAML descriptions of what generated traffic looks like.
+
+A profile declares weights for transaction types, statuses (overall and per
+type), currencies, per-type amount distributions, fee schedules per currency,
+and hour-of-day and day-of-week curves for timestamps:
+
+    name: retail
+    transaction_types: {payment: 0.8, refund: 0.1, subscription: 0.1}
+    statuses:
+      default: {completed: 0.9, pending: 0.1}
+      refund: {refunded: 1}
+    amounts:
+      default: {distribution: lognormal, median: 40, sigma: 0.9, min: 1, max: 5000}
+      subscription: {distribution: choice, values: [9.99, 19.99], weights: [3, 1]}
+    currencies: {USD: 0.7, EUR: 0.3}
+    fees:
+      default: {rate: 0.029, fixed: 0.30}
+      EUR: {rate: 0.034, fixed: 0.35}
+    timestamps:
+      hourly: [24 weights, hour 0 UTC first]
+      weekly: [7 weights, Monday first]
+
+Profiles are compiled once into alias tables and cumulative distributions, so
+sampling a chunk is a handful of vectorized NumPy calls. Compiled profiles are
+cached by a hash of their content: editing a file recompiles it on next use,
+and identical profiles share one compiled sampler.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from generation import FEE_FIXED, FEE_RATE, STATUS_WEIGHTS, STATUSES, TRANSACTION_TYPES
+
+SCENARIO_DIR = Path(os.environ.get('SCENARIO_DIR', Path(__file__).parent / "profiles"))
+
+AMOUNT_DISTRIBUTIONS = ["uniform", "lognormal", "normal", "choice"]
+
+
+class ScenarioError(ValueError):
+    """A scenario profile that does not exist or does not validate"""
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(1) categorical draws whatever the number of outcomes"""
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        size = len(weights)
+        scaled = weights * size / weights.sum()
+        self.probability = np.ones(size)
+        self.alias = np.arange(size)
+
+        small = [i for i in range(size) if scaled[i] < 1.0]
+        large = [i for i in range(size) if scaled[i] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def sample(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        columns = rng.integers(0, len(self.probability), count)
+        return np.where(rng.random(count) < self.probability[columns], columns, self.alias[columns])
+
+
+class AmountSampler:
+    def __init__(self, spec: dict):
+        self.distribution = spec.get("distribution", "uniform")
+        if self.distribution not in AMOUNT_DISTRIBUTIONS:
+            raise ScenarioError(f"Unknown amount distribution {self.distribution!r}, expected one of {', '.join(AMOUNT_DISTRIBUTIONS)}")
+        self.low = float(spec.get("min", 0.01))
+        self.high = float(spec.get("max", 1e9 if self.distribution != "uniform" else 1000.0))
+        if self.low <= 0 or self.high < self.low:
+            raise ScenarioError(f"Amount bounds must satisfy 0 < min <= max, got {self.low} and {self.high}")
+
+        if self.distribution == "lognormal":
+            median = float(spec["median"])
+            self.sigma = float(spec.get("sigma", 1.0))
+            if median <= 0 or self.sigma < 0:
+                raise ScenarioError(f"Lognormal amounts need a positive median and a non-negative sigma, got {median} and {self.sigma}")
+            self.mu = float(np.log(median))
+        elif self.distribution == "normal":
+            self.mean = float(spec["mean"])
+            self.std = float(spec.get("std", self.mean / 4))
+            if self.std < 0:
+                raise ScenarioError(f"Normal amounts need a non-negative std, got {self.std}")
+        elif self.distribution == "choice":
+            self.values = np.asarray(spec["values"], dtype=np.float64)
+            if self.values.ndim != 1 or not len(self.values) or (self.values <= 0).any():
+                raise ScenarioError("Choice amounts need a non-empty list of positive values")
+            weights = np.asarray(spec.get("weights", [1] * len(self.values)), dtype=np.float64)
+            if weights.shape != self.values.shape or (weights < 0).any() or weights.sum() <= 0:
+                raise ScenarioError("Choice amounts need one non-negative weight per value, with a positive total")
+            self.choices = AliasTable(weights)
+
+    def sample(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        if self.distribution == "uniform":
+            amounts = rng.uniform(self.low, self.high, count)
+        elif self.distribution == "lognormal":
+            amounts = rng.lognormal(self.mu, self.sigma, count)
+        elif self.distribution == "normal":
+            amounts = rng.normal(self.mean, self.std, count)
+        else:
+            return self.values[self.choices.sample(rng, count)]
+        return np.round(np.clip(amounts, self.low, self.high), 2)
+
+
+def weight_table(weights: dict, names: List[str], label: str) -> np.ndarray:
+    """Weights keyed by name as a vector in `names` order, rejecting unknown names"""
+    unknown = set(weights) - set(names)
+    if unknown:
+        raise ScenarioError(f"Unknown {label}: {', '.join(sorted(unknown))}")
+    vector = np.array([float(weights.get(name, 0)) for name in names])
+    if (vector < 0).any() or vector.sum() <= 0:
+        raise ScenarioError(f"{label.capitalize()} weights must be non-negative with a positive total")
+    return vector
+
+
+def curve(values: Optional[list], length: int, label: str) -> np.ndarray:
+    if values is None:
+        return np.ones(length)
+    vector = np.asarray(values, dtype=np.float64)
+    if vector.shape != (length,) or (vector < 0).any() or vector.sum() <= 0:
+        raise ScenarioError(f"{label} needs {length} non-negative weights with a positive total")
+    return vector
+
+
+class CompiledScenario:
+    """A profile turned into samplers; everything per-row is an array lookup"""
+
+    def __init__(self, profile: dict):
+        self.name = profile.get("name", "")
+        self.description = profile.get("description", "")
+
+        types = profile.get("transaction_types") or {name: 1 for name in TRANSACTION_TYPES}
+        self.types = AliasTable(weight_table(types, TRANSACTION_TYPES, "transaction type"))
+
+        statuses = profile.get("statuses") or {}
+        default_statuses = weight_table(statuses.get("default") or STATUS_WEIGHTS, STATUSES, "status")
+        unknown = set(statuses) - {"default"} - set(TRANSACTION_TYPES)
+        if unknown:
+            raise ScenarioError(f"Status weights for unknown transaction types: {', '.join(sorted(unknown))}")
+        self.statuses = [
+            AliasTable(weight_table(statuses[name], STATUSES, "status") if name in statuses else default_statuses)
+            for name in TRANSACTION_TYPES
+        ]
+
+        amounts = profile.get("amounts") or {}
+        unknown = set(amounts) - {"default"} - set(TRANSACTION_TYPES)
+        if unknown:
+            raise ScenarioError(f"Amounts for unknown transaction types: {', '.join(sorted(unknown))}")
+        default_amounts = AmountSampler(amounts.get("default") or {})
+        self.amounts = [AmountSampler(amounts[name]) if name in amounts else default_amounts for name in TRANSACTION_TYPES]
+
+        currencies = profile.get("currencies") or {"USD": 1}
+        self.currencies = np.array(list(currencies), dtype=object)
+        self.currency_table = AliasTable(weight_table(currencies, list(currencies), "currency"))
+
+        fees = profile.get("fees") or {}
+        default_fee = fees.get("default") or {"rate": FEE_RATE, "fixed": FEE_FIXED}
+        schedule = [fees.get(currency, default_fee) for currency in currencies]
+        self.fee_rates = np.array([float(fee.get("rate", 0)) for fee in schedule])
+        self.fee_fixed = np.array([float(fee.get("fixed", 0)) for fee in schedule])
+        if (self.fee_rates < 0).any() or (self.fee_fixed < 0).any():
+            raise ScenarioError("Fee rates and fixed fees must not be negative")
+
+        timestamps = profile.get("timestamps") or {}
+        hourly = curve(timestamps.get("hourly"), 24, "timestamps.hourly")
+        weekly = curve(timestamps.get("weekly"), 7, "timestamps.weekly")
+        # Relative weight of each hour of the week, Monday 00:00 first
+        self.hour_of_week = np.outer(weekly, hourly).ravel()
+
+    def sample_types(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        return self.types.sample(rng, count)
+
+    def sample_statuses(self, rng: np.random.Generator, type_codes: np.ndarray) -> np.ndarray:
+        status_codes = np.empty(len(type_codes), dtype=np.intp)
+        for code, table in enumerate(self.statuses):
+            rows = np.flatnonzero(type_codes == code)
+            if len(rows):
+                status_codes[rows] = table.sample(rng, len(rows))
+        return status_codes
+
+    def sample_amounts(self, rng: np.random.Generator, type_codes: np.ndarray) -> np.ndarray:
+        amounts = np.empty(len(type_codes))
+        for code, sampler in enumerate(self.amounts):
+            rows = np.flatnonzero(type_codes == code)
+            if len(rows):
+                amounts[rows] = sampler.sample(rng, len(rows))
+        return amounts
+
+    def sample_currencies(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        return self.currency_table.sample(rng, count)
+
+    def fees(self, amounts: np.ndarray, currency_codes: np.ndarray) -> np.ndarray:
+        return np.round(np.abs(amounts) * self.fee_rates[currency_codes] + self.fee_fixed[currency_codes], 2)
+
+    def sample_timestamps(self, rng: np.random.Generator, count: int, start: datetime, end: datetime) -> np.ndarray:
+        """Timestamps in [start, end] following the hourly and weekly curves.
+
+        The window is cut into hour buckets weighted by their hour of the week
+        and by how much of them lies inside the window; a bucket is drawn from
+        their cumulative weights and a second uniformly within it.
+        """
+        first_hour = start.replace(minute=0, second=0, microsecond=0)
+        hours = int((end - first_hour).total_seconds() // 3600) + 1
+        bucket_starts = np.datetime64(first_hour, "s") + np.arange(hours).astype("timedelta64[h]")
+
+        begin = np.maximum(bucket_starts, np.datetime64(start, "s"))
+        finish = np.minimum(bucket_starts + np.timedelta64(1, "h"), np.datetime64(end, "s") + np.timedelta64(1, "s"))
+        spans = (finish - begin).astype(np.int64)
+
+        hour_index = (first_hour.weekday() * 24 + first_hour.hour + np.arange(hours)) % 168
+        cdf = np.cumsum(self.hour_of_week[hour_index] * spans)
+        buckets = np.searchsorted(cdf, rng.random(count) * cdf[-1], side="right")
+        np.minimum(buckets, hours - 1, out=buckets)
+        offsets = (rng.random(count) * spans[buckets]).astype(np.int64).astype("timedelta64[s]")
+        return (begin[buckets] + offsets).astype("datetime64[us]")
+
+
+# Compiled profiles by content hash, and the hash last read for each file
+_compiled: Dict[str, CompiledScenario] = {}
+_files: Dict[Path, Tuple[float, str]] = {}
+
+
+def profile_hash(profile: dict) -> str:
+    return hashlib.sha256(json.dumps(profile, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def compile_scenario(profile: dict) -> CompiledScenario:
+    """Compile a parsed profile, reusing the cached result for identical content"""
+    if not isinstance(profile, dict):
+        raise ScenarioError("A scenario profile must be a mapping")
+    key = profile_hash(profile)
+    if key not in _compiled:
+        try:
+            _compiled[key] = CompiledScenario(profile)
+        except ScenarioError:
+            raise
+        except (KeyError, TypeError, ValueError) as e:
+            # Missing keys, wrong shapes and values that are not numbers
+            raise ScenarioError(f"Invalid scenario profile {profile.get('name', '')!r}: {e}")
+    return _compiled[key]
+
+
+def scenario_path(name: str) -> Path:
+    # Names map to files directly inside SCENARIO_DIR, never to paths elsewhere
+    if not name or "/" in name or "\\" in name or name.startswith("."):
+        raise ScenarioError(f"Invalid scenario name {name!r}")
+    for suffix in (".yaml", ".yml"):
+        path = SCENARIO_DIR / f"{name}{suffix}"
+        if path.is_file():
+            return path
+    raise ScenarioError(f"Unknown scenario {name!r}")
+
+
+def get_scenario(name: str) -> CompiledScenario:
+    """The compiled profile `name` from SCENARIO_DIR, recompiled only when the file changes"""
+    path = scenario_path(name)
+    modified = path.stat().st_mtime
+    cached = _files.get(path)
+    if cached is not None and cached[0] == modified:
+        return _compiled[cached[1]]
+
+    try:
+        profile = yaml.safe_load(path.read_text())
+    except yaml.YAMLError as e:
+        raise ScenarioError(f"Scenario {name!r} is not valid YAML: {e}")
+    profile = {"name": name, **(profile or {})}
+    compiled = compile_scenario(profile)
+    _files[path] = (modified, profile_hash(profile))
+    return compiled
+
+
+def list_scenarios() -> List[dict]:
+    scenarios = []
+    for path in sorted(SCENARIO_DIR.glob("*.y*ml")):
+        try:
+            scenario = get_scenario(path.stem)
+        except ScenarioError as e:
+            scenarios.append({"name": path.stem, "error": str(e)})
+            continue
+        scenarios.append({"name": path.stem, "description": scenario.description})
+    return scenarios
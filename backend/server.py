@@ -1,170 +1,236 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import sys
+import multiprocessing
+import asyncio
 import logging
-import csv
-import io
 import json
+import orjson
+import time
+import base64
+import binascii
+import inspect
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
-import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, Callable, List, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-import random
-from decimal import Decimal
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Sibling modules must resolve for both `server:app` and `backend.server:app`
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from models import (
+    BulkExportRequest, BulkInsertReport, GenerationJobRequest, PayPalTransaction,
+    TransactionGenerateRequest, TransactionStreamRequest
+)
+from generation import (
+    SEED_CHUNK_SIZE, generate_seeded_documents, new_seed, seeded_chunk_count
+)
+from jobs import Job, JobManager, JobQueueFull
+from columnar import COLUMNAR_MEDIA_TYPES, ColumnarEncoder
+from encoders import RowEncoder
+from compression import FILE_MEDIA_TYPES, FILE_SUFFIXES, compress_bytes, compress_stream, negotiate_encoding, zstd_available
+from metrics import (
+    FAILED_ROWS, GENERATE_PHASE_SECONDS, PERSISTED_ROWS, STATS_CACHE_REQUESTS, STREAMED_ROWS,
+    count_streamed_bytes, current_endpoint, monitor_event_loop_lag, observe_generation
+)
+from entities import get_pool
+from lifecycles import LifecycleMerger, count_lifecycles, generate_lifecycle_chunk
+from scenarios import ScenarioError, get_scenario, list_scenarios
+from storage import PageKey, TransactionFilter, get_store, naive_utc
+
+# Number of documents handed to the store per write
+BULK_INSERT_CHUNK_SIZE = int(os.environ.get('BULK_INSERT_CHUNK_SIZE', '500'))
+
+# Runs of at least this many rows are generated on the process pool instead of inline
+PARALLEL_GENERATION_THRESHOLD = int(os.environ.get('PARALLEL_GENERATION_THRESHOLD', '5000'))
+GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', str(os.cpu_count() or 1)))
+
+# Background generation jobs: concurrent runners and queued jobs beyond that
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', '16'))
+
+# Number of documents read from the store and encoded per export chunk
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# JSON responses smaller than this are sent uncompressed even when the client accepts gzip/zstd
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '4096'))
+
+# Upper bound on how long cached stats are served; writes invalidate them sooner
+STATS_CACHE_TTL_SECONDS = float(os.environ.get('STATS_CACHE_TTL_SECONDS', '60'))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open storage and start background work when the app starts, undo it on shutdown"""
+    await get_store().setup()
+    # Build or load the entity pool now rather than inside the first generate request
+    await asyncio.to_thread(get_pool)
+    
+    job_manager.start()
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    try:
+        yield
+    finally:
+        lag_monitor.cancel()
+        await job_manager.stop()
+        if generation_pool is not None:
+            generation_pool.shutdown(wait=False, cancel_futures=True)
+        await get_store().close()
 
 # Create the main app without a prefix
-app = FastAPI(title="PayPal Mock Transaction Generator", version="1.0.0")
+app = FastAPI(title="PayPal Mock Transaction Generator", version="1.0.0", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Transaction Models
-class PayPalTransaction(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    transaction_id: str = Field(default_factory=lambda: f"TXN{random.randint(100000000, 999999999)}")
-    transaction_type: Literal["payment", "refund", "subscription", "dispute", "chargeback"] = "payment"
-    status: Literal["completed", "pending", "failed", "cancelled", "refunded", "disputed"] = "completed"
-    amount: float
-    currency: str = "USD"
-    fee: float = 0.0
-    net_amount: float = 0.0
-    payer_email: str
-    payer_name: str
-    recipient_email: str
-    recipient_name: str
-    merchant_id: str = Field(default_factory=lambda: f"MERCHANT{random.randint(100000, 999999)}")
-    description: str
-    invoice_id: Optional[str] = None
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-
-class TransactionGenerateRequest(BaseModel):
-    count: int = Field(default=10, ge=1, le=1000)
-    transaction_type: Optional[Literal["payment", "refund", "subscription", "dispute", "chargeback"]] = None
-    status: Optional[Literal["completed", "pending", "failed", "cancelled", "refunded", "disputed"]] = None
-    min_amount: float = Field(default=1.0, ge=0.01)
-    max_amount: float = Field(default=1000.0, ge=0.01)
-    currency: str = "USD"
-    days_back: int = Field(default=30, ge=1, le=365)
-
-class BulkExportRequest(BaseModel):
-    format: Literal["json", "csv"] = "json"
-    start_date: Optional[datetime] = None
-    end_date: Optional[datetime] = None
-    transaction_type: Optional[str] = None
-    status: Optional[str] = None
-
-# Sample data for realistic generation
-SAMPLE_NAMES = [
-    "John Smith", "Sarah Johnson", "Michael Brown", "Emily Davis", "David Wilson",
-    "Jessica Garcia", "Christopher Martinez", "Ashley Anderson", "Matthew Taylor",
-    "Amanda Thomas", "Daniel Jackson", "Jennifer White", "James Harris", "Lisa Martin"
-]
-
-SAMPLE_EMAILS = [
-    "john.smith@email.com", "sarah.j@gmail.com", "mike.brown@yahoo.com",
-    "emily.davis@outlook.com", "david.w@company.com", "jessica.g@business.org",
-    "chris.m@startup.io", "ashley.a@freelance.net", "matt.t@agency.com",
-    "amanda.th@consultant.biz", "daniel.j@enterprise.com", "jennifer.w@shop.store"
-]
-
-SAMPLE_DESCRIPTIONS = [
-    "Online Purchase - Electronics", "Digital Service Subscription", "Freelance Web Development",
-    "Online Course Payment", "E-commerce Store Purchase", "Consulting Services",
-    "Software License Fee", "Marketplace Commission", "Digital Download",
-    "Monthly Subscription", "Product Return Refund", "Service Cancellation"
-]
-
-def generate_realistic_transaction(
-    transaction_type: Optional[str] = None,
-    status: Optional[str] = None,
-    min_amount: float = 1.0,
-    max_amount: float = 1000.0,
-    currency: str = "USD",
-    days_back: int = 30
-) -> PayPalTransaction:
-    """Generate a single realistic PayPal transaction"""
-    
-    # Generate random amount
-    amount = round(random.uniform(min_amount, max_amount), 2)
-    
-    # Calculate fee (typical PayPal fee: 2.9% + $0.30)
-    fee = round((amount * 0.029) + 0.30, 2)
-    net_amount = round(amount - fee, 2)
-    
-    # Generate random timestamp within the specified range
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days_back)
-    random_timestamp = start_date + timedelta(
-        seconds=random.randint(0, int((end_date - start_date).total_seconds()))
-    )
-    
-    # Select random data
-    payer_name = random.choice(SAMPLE_NAMES)
-    payer_email = random.choice(SAMPLE_EMAILS)
-    recipient_name = random.choice(SAMPLE_NAMES)
-    recipient_email = random.choice(SAMPLE_EMAILS)
-    description = random.choice(SAMPLE_DESCRIPTIONS)
-    
-    # Ensure payer and recipient are different
-    while recipient_email == payer_email:
-        recipient_email = random.choice(SAMPLE_EMAILS)
-    while recipient_name == payer_name:
-        recipient_name = random.choice(SAMPLE_NAMES)
-    
-    # Set transaction type and status
-    if not transaction_type:
-        transaction_type = random.choice(["payment", "refund", "subscription", "dispute", "chargeback"])
-    
-    if not status:
-        # Weighted status distribution (most transactions are completed)
-        status_weights = {
-            "completed": 0.7,
-            "pending": 0.15,
-            "failed": 0.05,
-            "cancelled": 0.03,
-            "refunded": 0.04,
-            "disputed": 0.03
-        }
-        status = random.choices(
-            list(status_weights.keys()),
-            weights=list(status_weights.values())
-        )[0]
-    
-    # Adjust amounts for refunds
-    if transaction_type == "refund":
-        amount = -abs(amount)
-        fee = -abs(fee)
-        net_amount = amount - fee
-    
-    return PayPalTransaction(
-        transaction_type=transaction_type,
-        status=status,
-        amount=amount,
-        currency=currency,
-        fee=fee,
-        net_amount=net_amount,
-        payer_email=payer_email,
-        payer_name=payer_name,
-        recipient_email=recipient_email,
-        recipient_name=recipient_name,
-        description=description,
-        invoice_id=f"INV-{random.randint(1000, 9999)}" if random.random() > 0.5 else None,
-        timestamp=random_timestamp,
-        created_at=random_timestamp
-    )
+async def insert_chunk(
+    chunk_index: int,
+    documents: List[dict],
+    profile: Optional[str] = None,
+    run_id: Optional[str] = None
+) -> BulkInsertReport:
+    """Store one chunk, timing it as the persistence phase"""
+    with GENERATE_PHASE_SECONDS.labels("persistence").time():
+        report = await get_store().insert_batch(chunk_index, documents, profile, run_id)
+    PERSISTED_ROWS.inc(report.inserted)
+    FAILED_ROWS.inc(report.failed)
+    return report
+
+async def bulk_insert_transactions(
+    chunks: AsyncIterable[List[dict]],
+    on_chunk: Optional[Callable[[BulkInsertReport], None]] = None,
+    profile: Optional[str] = None,
+    run_id: Optional[str] = None
+) -> BulkInsertReport:
+    """Write chunks of documents, generating the next chunk while the previous write is in flight.
+
+    `on_chunk` is called with each chunk's report as soon as its write finishes.
+    `run_id` names the run's partition when storage is partitioned per run; runs
+    pass their seed, which also determines the generated ids.
+    """
+    report = BulkInsertReport()
+    pending = None
+    chunk_index = 0
+
+    async def collect(task):
+        chunk_report = await task
+        report.add(chunk_report)
+        if on_chunk is not None:
+            on_chunk(chunk_report)
+
+    try:
+        async for documents in chunks:
+            if pending is not None:
+                await collect(pending)
+            pending = asyncio.create_task(insert_chunk(chunk_index, documents, profile, run_id))
+            chunk_index += 1
+            # Let the task hand the write to Motor's executor before we generate the next chunk
+            await asyncio.sleep(0)
+    except BaseException:
+        # Cancelled or failed mid-run: don't leave the in-flight write orphaned
+        if pending is not None:
+            pending.cancel()
+        raise
+
+    if pending is not None:
+        await collect(pending)
+
+    for error in report.errors:
+        logger.warning(f"Bulk insert failure in chunk {error['chunk']} at index {error['index']}: {error['message']}")
+
+    return report
+
+generation_pool: Optional[ProcessPoolExecutor] = None
+
+def get_generation_pool() -> ProcessPoolExecutor:
+    global generation_pool
+    if generation_pool is None:
+        # Forking a process that already runs the event loop and driver threads can deadlock
+        # the child, so workers start from a clean forkserver (spawn where there is none)
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        generation_pool = ProcessPoolExecutor(
+            max_workers=GENERATION_WORKERS, mp_context=multiprocessing.get_context(start_method)
+        )
+    return generation_pool
+
+async def generate_document_chunks(
+    count: int,
+    seed: int,
+    now: datetime,
+    params: dict,
+    worker: Callable = generate_seeded_documents
+) -> AsyncIterator:
+    """Yield the seeded chunks of a run in order.
+
+    Small runs are generated inline. Large ones are spread over the process
+    pool so the event loop stays free, with a bounded number of chunks in flight.
+    `worker` builds one chunk and must be picklable for the pool.
+    """
+    chunk_total = seeded_chunk_count(count)
+
+    if count < PARALLEL_GENERATION_THRESHOLD or GENERATION_WORKERS <= 1:
+        for chunk_index in range(chunk_total):
+            with GENERATE_PHASE_SECONDS.labels("generation").time():
+                documents = worker(seed, chunk_index, count, now, params)
+            yield documents
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = get_generation_pool()
+    pending = deque()
+    next_index = 0
+    try:
+        while next_index < chunk_total or pending:
+            while next_index < chunk_total and len(pending) < GENERATION_WORKERS * 2:
+                pending.append(loop.run_in_executor(pool, worker, seed, next_index, count, now, params))
+                next_index += 1
+            # Chunks come back in index order, whichever worker finishes first. Only the
+            # time spent waiting on a chunk is observed, since the rest overlaps other work
+            with GENERATE_PHASE_SECONDS.labels("generation").time():
+                documents = await pending.popleft()
+            yield documents
+    finally:
+        for future in pending:
+            future.cancel()
+
+async def generate_run_chunks(request: TransactionGenerateRequest, seed: int, now: datetime) -> AsyncIterator[List[dict]]:
+    """The documents of a generation request, chunk by chunk, with lifecycle chunks merged into time order"""
+    params = request.generation_params()
+    if not request.lifecycles:
+        async for documents in generate_document_chunks(request.count, seed, now, params):
+            yield documents
+        return
+
+    merger = LifecycleMerger(request.count, now, request.days_back)
+    async for payments, follow_ups in generate_document_chunks(request.count, seed, now, params, generate_lifecycle_chunk):
+        yield merger.merge(payments, follow_ups)
+
+async def generate_insert_chunks(
+    request: TransactionGenerateRequest,
+    seed: int,
+    now: datetime,
+    on_generated: Callable[[List[dict]], None]
+) -> AsyncIterator[List[dict]]:
+    """A run's documents in bulk insert sized chunks for bulk_insert_transactions.
+
+    Each generated chunk goes to `on_generated` before its first slice is written,
+    and the next one is generated while the previous slice's write is in flight.
+    """
+    async for documents in generate_run_chunks(request, seed, now):
+        on_generated(documents)
+        for start in range(0, len(documents), BULK_INSERT_CHUNK_SIZE):
+            yield documents[start:start + BULK_INSERT_CHUNK_SIZE]
 
 # API Routes
 @api_router.get("/")
@@ -176,129 +242,446 @@ async def root():
             "/api/transactions/generate",
             "/api/transactions",
             "/api/transactions/export",
-            "/api/transactions/stats"
+            "/api/transactions/stats",
+            "/api/transactions/stream",
+            "/api/scenarios",
+            "/api/jobs/generate",
+            "/api/admin/indexes",
+            "/api/admin/rollups/rebuild",
+            "/api/admin/partitions",
+            "/api/admin/retention/run",
+            "/api/metrics",
+            "/metrics"
         ]
     }
 
+@api_router.get("/metrics")
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def require_seed_for_run_partitions(seed: Optional[int]):
+    """Run partitioning writes each seed to its own collection, so interactive writes must name one"""
+    if seed is None and get_store().partitions_per_run:
+        raise HTTPException(
+            status_code=422,
+            detail="Storage is partitioned per run; pass a seed, or use /api/jobs/generate for batch loads"
+        )
+
+def require_scenario(name: Optional[str]):
+    """Compile the requested scenario up front, so a bad profile fails the request rather than a worker"""
+    if name is None:
+        return
+    try:
+        get_scenario(name)
+    except ScenarioError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def query_model(model):
+    """Dependency building `model` from query parameters.
+
+    Plain Depends(model) checks each field but lets the model's own validators
+    raise out of dependency resolution as a 500; here they fail with a 422 too.
+    """
+    def dependency(**fields):
+        try:
+            return model(**fields)
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("query", *error["loc"])} for error in e.errors()])
+
+    dependency.__signature__ = inspect.signature(model)
+    return dependency
+
+@api_router.get("/scenarios")
+async def get_scenarios():
+    """List the scenario profiles generation requests can name"""
+    return list_scenarios()
+
 @api_router.post("/transactions/generate", response_model=List[PayPalTransaction])
-async def generate_transactions(request: TransactionGenerateRequest):
+async def generate_transactions(request: TransactionGenerateRequest, accept_encoding: Optional[str] = Header(None)):
     """Generate mock PayPal transactions"""
+    current_endpoint.set("generate")
+    require_scenario(request.scenario)
+    require_seed_for_run_partitions(request.seed)
+    started = time.perf_counter()
     transactions = []
-    
-    for _ in range(request.count):
-        transaction = generate_realistic_transaction(
-            transaction_type=request.transaction_type,
-            status=request.status,
-            min_amount=request.min_amount,
-            max_amount=request.max_amount,
-            currency=request.currency,
-            days_back=request.days_back
+    seed = request.seed if request.seed is not None else new_seed()
+    now = request.resolved_reference_time()
+
+    chunks = generate_insert_chunks(request, seed, now, transactions.extend)
+    report = await bulk_insert_transactions(chunks, profile=request.db_profile, run_id=str(seed))
+    observe_generation("generate", len(transactions), time.perf_counter() - started)
+    invalidate_stats()
+    headers = {
+        "X-Inserted-Count": str(report.inserted),
+        "X-Failed-Count": str(report.failed),
+        "X-Seed": str(seed)
+    }
+    if report.has_duplicates():
+        # The response would otherwise list rows an earlier run stored, not this one
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f"{report.failed} of {len(transactions)} transactions for seed {seed} already exist "
+                f"and {report.inserted} were stored; clear them or use another seed"
+            ),
+            headers=headers
         )
-        transactions.append(transaction)
-        
-        # Save to database
-        await db.transactions.insert_one(transaction.dict())
-    
-    return transactions
+    if report.inserted == 0 and report.failed > 0:
+        raise HTTPException(status_code=500, detail=f"Failed to save transactions: {report.errors[0]['message']}")
+
+    # Mongo's insert_many stamps an ObjectId _id onto each document it writes
+    for transaction in transactions:
+        transaction.pop("_id", None)
+
+    return json_response(transactions, accept_encoding, headers=headers)
+
+async def stream_generated_transactions(request: TransactionStreamRequest, seed: int) -> AsyncIterator[bytes]:
+    """Encode generated chunks straight to the response, optionally rate limited and persisted"""
+    encoder = RowEncoder(request.format)
+    now = request.resolved_reference_time()
+    # Rate-limited streams flush roughly ten times a second
+    slice_size = max(1, int(request.rate // 10)) if request.rate else SEED_CHUNK_SIZE
+    streamed_rows = STREAMED_ROWS.labels("stream", request.format)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    emitted = 0
+    report = BulkInsertReport()
+    pending = None
+    chunk_index = 0
+
+    yield encoder.header()
+    try:
+        async for documents in generate_run_chunks(request, seed, now):
+            for start in range(0, len(documents), slice_size):
+                rows = documents[start:start + slice_size]
+                # Encode before inserting: Mongo's insert_many adds an _id to each document
+                chunk = encoder.encode(rows)
+                if request.persist:
+                    if pending is not None:
+                        report.add(await pending)
+                    pending = asyncio.create_task(insert_chunk(chunk_index, rows, request.db_profile, str(seed)))
+                    chunk_index += 1
+                yield chunk
+                emitted += len(rows)
+                streamed_rows.inc(len(rows))
+                if request.rate:
+                    delay = started + emitted / request.rate - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+        if pending is not None:
+            report.add(await pending)
+    finally:
+        observe_generation("stream", emitted, loop.time() - started)
+        if pending is not None and not pending.done():
+            pending.cancel()
+        if request.persist:
+            invalidate_stats()
+            if report.failed:
+                logger.warning(f"Streamed generation persisted {report.inserted} rows, {report.failed} failed")
+    yield encoder.footer()
+
+@api_router.post("/transactions/stream")
+async def stream_transactions(request: TransactionStreamRequest, accept_encoding: Optional[str] = Header(None)):
+    """Stream freshly generated transactions as NDJSON or CSV without materializing them"""
+    current_endpoint.set("stream")
+    require_scenario(request.scenario)
+    if request.persist:
+        require_seed_for_run_partitions(request.seed)
+    seed = request.seed if request.seed is not None else new_seed()
+    body = stream_generated_transactions(request, seed)
+    headers = {"X-Seed": str(seed), "Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding:
+        # Rows are sent as they are generated, so each chunk is flushed rather than left in the compressor
+        body = compress_stream(body, encoding, flush_chunks=True)
+        headers["Content-Encoding"] = encoding
+    body = count_streamed_bytes(body, "stream", request.format)
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[request.format], headers=headers)
+
+@api_router.get("/transactions/stream")
+async def stream_transactions_get(request: TransactionStreamRequest = Depends(query_model(TransactionStreamRequest)), accept_encoding: Optional[str] = Header(None)):
+    """Query-string variant of POST /transactions/stream, handy for curl pipelines"""
+    return await stream_transactions(request, accept_encoding)
+
+def json_response(content, accept_encoding: Optional[str], headers: Optional[dict] = None) -> Response:
+    """Encode with orjson and compress large bodies when the client accepts it"""
+    body = orjson.dumps(content)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= COMPRESSION_MIN_SIZE else None
+    if encoding:
+        body = compress_bytes(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+def encode_page_cursor(transaction: dict) -> str:
+    """Build an opaque cursor pointing just past the given transaction"""
+    payload = json.dumps({"t": transaction["timestamp"].isoformat(), "id": transaction["id"]})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_page_cursor(cursor: str) -> PageKey:
+    """Turn an opaque cursor back into the (timestamp, id) of the row it points past"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        timestamp = naive_utc(datetime.fromisoformat(payload["t"]))
+        last_id = payload["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(last_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return timestamp, last_id
 
 @api_router.get("/transactions", response_model=List[PayPalTransaction])
 async def get_transactions(
     limit: int = Query(50, ge=1, le=1000),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header"),
     transaction_type: Optional[str] = Query(None),
-    status: Optional[str] = Query(None)
+    status: Optional[str] = Query(None),
+    accept_encoding: Optional[str] = Header(None)
 ):
-    """Get stored transactions with filtering"""
-    filter_query = {}
+    """Get stored transactions with filtering.
+
+    Pass the X-Next-Cursor header of one page as `cursor` to fetch the next one;
+    unlike `skip`, this costs the same however deep the page is.
+    """
+    current_endpoint.set("list")
+    filters = TransactionFilter(transaction_type=transaction_type, status=status)
     
-    if transaction_type:
-        filter_query["transaction_type"] = transaction_type
-    if status:
-        filter_query["status"] = status
+    if cursor:
+        transactions = await get_store().query(filters, limit, after=decode_page_cursor(cursor))
+    else:
+        transactions = await get_store().query(filters, limit, skip=skip)
     
-    transactions = await db.transactions.find(filter_query).skip(skip).limit(limit).sort("timestamp", -1).to_list(limit)
-    return [PayPalTransaction(**transaction) for transaction in transactions]
+    headers = {}
+    if len(transactions) == limit:
+        headers["X-Next-Cursor"] = encode_page_cursor(transactions[-1])
+    return json_response(transactions, accept_encoding, headers=headers)
+
+# Bumped after every write to the transactions collection so cached stats are recomputed
+data_version = 0
+stats_cache = {"version": None, "computed_at": 0.0, "stats": None}
+stats_lock = asyncio.Lock()
+
+def invalidate_stats():
+    global data_version
+    data_version += 1
+
+async def compute_transaction_stats() -> dict:
+    """Compute dashboard statistics from the store's rollups.
+
+    Recent activity is counted in whole days, starting at midnight seven days ago.
+    """
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return await get_store().stats(since=today - timedelta(days=7))
+
+def cached_stats_valid() -> bool:
+    return (
+        stats_cache["version"] == data_version
+        and time.monotonic() - stats_cache["computed_at"] < STATS_CACHE_TTL_SECONDS
+    )
 
 @api_router.get("/transactions/stats")
 async def get_transaction_stats():
-    """Get transaction statistics"""
-    total_count = await db.transactions.count_documents({})
-    
-    # Get stats by type
-    type_pipeline = [
-        {"$group": {"_id": "$transaction_type", "count": {"$sum": 1}, "total_amount": {"$sum": "$amount"}}}
-    ]
-    type_stats = await db.transactions.aggregate(type_pipeline).to_list(100)
+    """Get transaction statistics, recomputed only after writes or when the TTL expires"""
+    current_endpoint.set("stats")
+    if cached_stats_valid():
+        STATS_CACHE_REQUESTS.labels("hit").inc()
+        return stats_cache["stats"]
     
-    # Get stats by status
-    status_pipeline = [
-        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-    ]
-    status_stats = await db.transactions.aggregate(status_pipeline).to_list(100)
+    # Concurrent refreshes wait for the one already running instead of each scanning
+    async with stats_lock:
+        if cached_stats_valid():
+            STATS_CACHE_REQUESTS.labels("hit").inc()
+            return stats_cache["stats"]
+        STATS_CACHE_REQUESTS.labels("miss").inc()
+        version = data_version
+        stats = await compute_transaction_stats()
+        stats_cache.update(version=version, computed_at=time.monotonic(), stats=stats)
     
-    # Get recent activity (last 7 days)
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    recent_count = await db.transactions.count_documents({"timestamp": {"$gte": seven_days_ago}})
-    
-    return {
-        "total_transactions": total_count,
-        "recent_transactions": recent_count,
-        "by_type": {stat["_id"]: {"count": stat["count"], "total_amount": stat.get("total_amount", 0)} for stat in type_stats},
-        "by_status": {stat["_id"]: stat["count"] for stat in status_stats}
-    }
+    return stats
+
+EXPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    **COLUMNAR_MEDIA_TYPES
+}
+
+def make_export_encoder(request: BulkExportRequest):
+    if request.format not in COLUMNAR_MEDIA_TYPES:
+        if request.codec:
+            raise HTTPException(status_code=400, detail="codec only applies to parquet and arrow exports")
+        return RowEncoder(request.format)
+    try:
+        return ColumnarEncoder(request.format, codec=request.codec)
+    except ImportError:
+        raise HTTPException(status_code=501, detail=f"{request.format} exports require pyarrow")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def stream_export(batches: AsyncIterable[List[dict]], encoder, format: str) -> AsyncIterator[bytes]:
+    """Encode stored rows batch by batch so memory stays bounded by EXPORT_BATCH_SIZE"""
+    streamed_rows = STREAMED_ROWS.labels("export", format)
+    # Building a Parquet/Arrow row group takes hundreds of milliseconds, so it runs off the event loop
+    offload = format in COLUMNAR_MEDIA_TYPES
+    yield encoder.header()
+
+    async for batch in batches:
+        streamed_rows.inc(len(batch))
+        yield await asyncio.to_thread(encoder.encode, batch) if offload else encoder.encode(batch)
+
+    yield await asyncio.to_thread(encoder.footer) if offload else encoder.footer()
 
 @api_router.post("/transactions/export")
-async def export_transactions(request: BulkExportRequest):
-    """Export transactions in JSON or CSV format"""
-    filter_query = {}
+async def export_transactions(request: BulkExportRequest, accept_encoding: Optional[str] = Header(None)):
+    """Export transactions as JSON, NDJSON, CSV, Parquet or an Arrow IPC stream"""
+    current_endpoint.set("export")
+    if request.compression == "zstd" and not zstd_available():
+        raise HTTPException(status_code=501, detail="zstd compression requires the zstandard package")
+    encoder = make_export_encoder(request)
+    filters = TransactionFilter(
+        transaction_type=request.transaction_type,
+        status=request.status,
+        start_date=request.start_date,
+        end_date=request.end_date
+    )
+    batches = get_store().stream(filters, EXPORT_BATCH_SIZE, profile=request.db_profile)
     
-    if request.start_date:
-        filter_query["timestamp"] = {"$gte": request.start_date}
-    if request.end_date:
-        if "timestamp" in filter_query:
-            filter_query["timestamp"]["$lte"] = request.end_date
-        else:
-            filter_query["timestamp"] = {"$lte": request.end_date}
-    if request.transaction_type:
-        filter_query["transaction_type"] = request.transaction_type
-    if request.status:
-        filter_query["status"] = request.status
+    body = stream_export(batches, encoder, request.format)
+    filename = f"transactions.{request.format}"
+    media_type = EXPORT_MEDIA_TYPES[request.format]
+    headers = {"Vary": "Accept-Encoding"}
     
-    transactions = await db.transactions.find(filter_query).sort("timestamp", -1).to_list(10000)
+    if request.compression and request.compression != "none":
+        # Explicit compression produces a compressed file rather than a transfer encoding
+        body = compress_stream(body, request.compression)
+        filename += FILE_SUFFIXES[request.compression]
+        media_type = FILE_MEDIA_TYPES[request.compression]
+    elif request.compression is None and request.format not in COLUMNAR_MEDIA_TYPES:
+        # Parquet and Arrow are already compressed internally
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding:
+            body = compress_stream(body, encoding)
+            headers["Content-Encoding"] = encoding
     
-    if request.format == "json":
-        # Return JSON format
-        json_data = json.dumps([PayPalTransaction(**t).dict() for t in transactions], default=str, indent=2)
-        return StreamingResponse(
-            io.StringIO(json_data),
-            media_type="application/json",
-            headers={"Content-Disposition": "attachment; filename=transactions.json"}
-        )
-    
-    elif request.format == "csv":
-        # Return CSV format
-        output = io.StringIO()
-        if transactions:
-            fieldnames = PayPalTransaction(**transactions[0]).dict().keys()
-            writer = csv.DictWriter(output, fieldnames=fieldnames)
-            writer.writeheader()
-            for transaction in transactions:
-                writer.writerow(PayPalTransaction(**transaction).dict())
-        
-        return StreamingResponse(
-            io.StringIO(output.getvalue()),
-            media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=transactions.csv"}
-        )
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    body = count_streamed_bytes(body, "export", request.format)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+@api_router.get("/admin/indexes")
+async def get_index_state():
+    """Report declared transaction indexes and whether they are present"""
+    return await get_store().index_state()
+
+@api_router.post("/admin/rollups/rebuild")
+async def rebuild_transaction_rollups():
+    """Recompute the stats rollups from the raw transactions"""
+    count = await get_store().rebuild_stats()
+    invalidate_stats()
+    return {"message": f"Rebuilt {count} rollups"}
+
+@api_router.get("/admin/partitions")
+async def list_partitions():
+    """List transaction partitions with their timestamp ranges and row counts"""
+    return await get_store().partitions()
+
+@api_router.delete("/admin/partitions/{name}")
+async def drop_partition(name: str):
+    """Drop one partition, e.g. a single generation run, together with its stats"""
+    current_endpoint.set("clear")
+    count = await get_store().drop_partition(name)
+    if count is None:
+        raise HTTPException(status_code=404, detail="Partition not found")
+    invalidate_stats()
+    return {"message": f"Dropped partition {name} with {count} transactions"}
+
+@api_router.post("/admin/retention/run")
+async def run_retention():
+    """Apply the retention policy now instead of waiting for the next scheduled pass"""
+    result = await get_store().apply_retention()
+    invalidate_stats()
+    return result
+
+async def run_generation_job(job: Job):
+    """Generate and persist a job's transactions, reporting progress on the job"""
+    current_endpoint.set("jobs")
+    started = time.perf_counter()
+    request = job.request
+    seed = request.seed if request.seed is not None else new_seed()
+    now = request.resolved_reference_time()
+    job.update(result={"seed": seed})
+
+    def record_generated(documents: List[dict]):
+        generated = count_lifecycles(documents) if request.lifecycles else len(documents)
+        job.update(generated=job.generated + generated, generated_rows=job.generated_rows + len(documents))
+
+    def record_chunk(chunk_report: BulkInsertReport):
+        invalidate_stats()
+        job.update(persisted=job.persisted + chunk_report.inserted, failed=job.failed + chunk_report.failed)
+
+    chunks = generate_insert_chunks(request, seed, now, record_generated)
+    await bulk_insert_transactions(chunks, on_chunk=record_chunk, profile=request.db_profile, run_id=str(seed))
+    observe_generation("jobs", job.generated_rows, time.perf_counter() - started)
+
+job_manager = JobManager(run_generation_job, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE)
+
+def get_job_or_404(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.post("/jobs/generate", status_code=202)
+async def create_generation_job(request: GenerationJobRequest):
+    """Queue a large generation run and return its job id right away"""
+    require_scenario(request.scenario)
+    try:
+        # Lifecycle runs count payments; their follow-ups only show in the row counters
+        job = job_manager.submit(request, total=request.count, unit="payments" if request.lifecycles else "transactions")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.snapshot()
+
+@api_router.get("/jobs")
+async def list_jobs():
+    """List queued, running and recently finished jobs"""
+    return [job.snapshot() for job in job_manager.jobs.values()]
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get a job's status and progress"""
+    return get_job_or_404(job_id).snapshot()
+
+@api_router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream a job's progress as server-sent events until it finishes"""
+    job = get_job_or_404(job_id)
+
+    async def events():
+        async for snapshot in job.follow(min_interval=0.5):
+            yield f"data: {json.dumps(snapshot, default=str)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@api_router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; rows already persisted are kept"""
+    get_job_or_404(job_id)
+    return job_manager.cancel(job_id).snapshot()
 
 @api_router.delete("/transactions")
 async def clear_all_transactions():
     """Clear all generated transactions"""
-    result = await db.transactions.delete_many({})
-    return {"message": f"Cleared {result.deleted_count} transactions"}
+    current_endpoint.set("clear")
+    count = await get_store().clear()
+    invalidate_stats()
+    return {"message": f"Cleared {count} transactions"}
 
 # Include the router in the main app
 app.include_router(api_router)
+# Prometheus scrapes /metrics by default; /api/metrics stays for ingresses that only route /api here
+app.add_api_route("/metrics", metrics, methods=["GET"])
 
 app.add_middleware(
     CORSMiddleware,
@@ -306,6 +689,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Inserted-Count", "X-Failed-Count", "X-Seed"],
 )
 
 # Configure logging
@@ -314,7 +698,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
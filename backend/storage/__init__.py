@@ -0,0 +1,42 @@
+"""Pluggable transaction storage.
+
+STORAGE_BACKEND picks the implementation: "mongo" (default), "memory" for
+tests and throwaway runs, or "sql" for PostgreSQL at SQL_DATABASE_URL. The sql
+backend imports SQLAlchemy only when it is selected.
+"""
+import os
+from typing import Optional
+
+from .base import PageKey, TransactionFilter, TransactionStore, naive_utc, stats_summary
+
+BACKENDS = ["mongo", "memory", "sql"]
+
+_store: Optional[TransactionStore] = None
+
+
+def create_store(backend: str) -> TransactionStore:
+    if backend == "mongo":
+        from .mongo import MongoStore
+        return MongoStore()
+    if backend == "memory":
+        from .memory import MemoryStore
+        return MemoryStore()
+    if backend == "sql":
+        from .sql import SQLStore
+        return SQLStore()
+    raise ValueError(f"Unknown storage backend: {backend}, expected one of {', '.join(BACKENDS)}")
+
+
+def get_store() -> TransactionStore:
+    """The app's store, created from STORAGE_BACKEND on first use"""
+    global _store
+    if _store is None:
+        _store = create_store(os.environ.get('STORAGE_BACKEND', 'mongo'))
+    return _store
+
+
+def set_store(store: Optional[TransactionStore]):
+    """Replace the app's store, e.g. with a pre-built one in tools and tests"""
+    global _store
+    _store = store
+
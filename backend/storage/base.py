@@ -0,0 +1,129 @@
+"""The interface every transaction storage backend implements"""
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from models import BulkInsertReport
+
+# Position of a row in the default order: (timestamp, id), newest first
+PageKey = Tuple[datetime, str]
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; aware inputs are converted so they compare against them"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class TransactionFilter:
+    """Equality and date-range filters shared by listing and export"""
+
+    def __init__(
+        self,
+        transaction_type: Optional[str] = None,
+        status: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ):
+        self.transaction_type = transaction_type
+        self.status = status
+        self.start_date = naive_utc(start_date)
+        self.end_date = naive_utc(end_date)
+
+
+def stats_summary(rollups: List[dict], since: datetime) -> dict:
+    """Fold (transaction_type, status, day, count, total_amount) rollups into the stats response"""
+    by_type = {}
+    by_status = {}
+    total = recent = 0
+    for rollup in rollups:
+        total += rollup["count"]
+        if rollup["day"] >= since:
+            recent += rollup["count"]
+        type_stats = by_type.setdefault(rollup["transaction_type"], {"count": 0, "total_amount": 0})
+        type_stats["count"] += rollup["count"]
+        type_stats["total_amount"] += rollup["total_amount"]
+        by_status[rollup["status"]] = by_status.get(rollup["status"], 0) + rollup["count"]
+    return {
+        "total_transactions": total,
+        "recent_transactions": recent,
+        "by_type": by_type,
+        "by_status": by_status
+    }
+
+
+class TransactionStore(ABC):
+    """Persistence for generated transactions.
+
+    Reads always come back newest first, ordered by (timestamp, id), as plain
+    dicts holding the TRANSACTION_FIELDS keys. `profile` names a write/read
+    profile; backends without profiles ignore it.
+    """
+
+    name: str = ""
+    # Whether every generation run is written to a partition of its own
+    partitions_per_run: bool = False
+
+    async def setup(self):
+        """Prepare tables, indexes and derived data when the app starts"""
+
+    async def close(self):
+        """Release connections when the app shuts down"""
+
+    @abstractmethod
+    async def insert_batch(
+        self,
+        chunk_index: int,
+        documents: List[dict],
+        profile: Optional[str] = None,
+        run_id: Optional[str] = None
+    ) -> BulkInsertReport:
+        """Store one chunk, keeping what can be written when some rows fail.
+
+        `run_id` identifies the generation run the chunk belongs to; backends that
+        partition per run use it to pick the partition.
+        """
+
+    @abstractmethod
+    async def query(
+        self,
+        filters: TransactionFilter,
+        limit: int,
+        skip: int = 0,
+        after: Optional[PageKey] = None,
+        profile: Optional[str] = None
+    ) -> List[dict]:
+        """One page of matching rows, starting past `after` when given"""
+
+    @abstractmethod
+    def stream(self, filters: TransactionFilter, batch_size: int, profile: Optional[str] = None) -> AsyncIterator[List[dict]]:
+        """Every matching row, in batches of at most `batch_size`"""
+
+    @abstractmethod
+    async def stats(self, since: datetime) -> dict:
+        """Totals by type and status, and the count of rows on or after `since`"""
+
+    @abstractmethod
+    async def rebuild_stats(self) -> int:
+        """Recompute the data behind `stats` from the stored rows, returning the number of rollups"""
+
+    @abstractmethod
+    async def clear(self) -> int:
+        """Delete every transaction, returning how many there were"""
+
+    async def index_state(self) -> dict:
+        """Declared indexes and whether they exist"""
+        return {"declared": [], "unmanaged": []}
+
+    async def partitions(self) -> List[dict]:
+        """Physical partitions of the stored rows; unpartitioned backends have none"""
+        return []
+
+    async def drop_partition(self, name: str) -> Optional[int]:
+        """Drop one partition, returning its row count, or None when there is no such partition"""
+        return None
+
+    async def apply_retention(self) -> dict:
+        """Expire rows past the retention window; a no-op for backends without retention"""
+        return {"dropped_partitions": [], "trimmed_rollups": 0}
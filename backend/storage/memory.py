@@ -0,0 +1,171 @@
+"""In-process backend for tests, CI and throwaway runs.
+
+Rows live in a dict keyed by id, which doubles as the unique index. Each
+filter combination the API can ask for has a secondary index: a list of
+(timestamp, id) keys kept in ascending order, read backwards for newest-first
+pages and searched with bisect for keyset cursors and date ranges. Appends are
+sorted lazily on the next read, which Timsort does in near-linear time for
+the mostly ordered runs generation produces. Rollups are maintained on write
+exactly like the Mongo ones, so stats never scan rows.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from generation import TRANSACTION_FIELDS
+from models import BulkInsertReport
+
+from .base import PageKey, TransactionFilter, TransactionStore, stats_summary
+
+# Sorts after any uuid, so (timestamp, MAX_ID) bounds every key at that timestamp
+MAX_ID = "\uffff"
+
+INDEXES = [
+    ("id_unique", [("id", 1)]),
+    ("timestamp_id", [("timestamp", -1), ("id", -1)]),
+    ("type_timestamp_id", [("transaction_type", 1), ("timestamp", -1), ("id", -1)]),
+    ("status_timestamp_id", [("status", 1), ("timestamp", -1), ("id", -1)]),
+    ("type_status_timestamp_id", [("transaction_type", 1), ("status", 1), ("timestamp", -1), ("id", -1)]),
+]
+
+
+class _SortedKeys:
+    def __init__(self):
+        self.keys: List[PageKey] = []
+        self.dirty = False
+
+    def add(self, key: PageKey):
+        if self.keys and key < self.keys[-1]:
+            self.dirty = True
+        self.keys.append(key)
+
+    def sorted(self) -> List[PageKey]:
+        if self.dirty:
+            self.keys.sort()
+            self.dirty = False
+        return self.keys
+
+
+class MemoryStore(TransactionStore):
+    name = "memory"
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.rows: Dict[str, dict] = {}
+        self.indexes: Dict[Tuple, _SortedKeys] = {}
+        self.rollups: Dict[Tuple[str, str, datetime], List] = {}
+
+    def index_keys(self, document: dict):
+        transaction_type, status = document["transaction_type"], document["status"]
+        return [(), ("type", transaction_type), ("status", status), ("type_status", transaction_type, status)]
+
+    def index_for(self, filters: TransactionFilter) -> List[PageKey]:
+        if filters.transaction_type and filters.status:
+            name = ("type_status", filters.transaction_type, filters.status)
+        elif filters.transaction_type:
+            name = ("type", filters.transaction_type)
+        elif filters.status:
+            name = ("status", filters.status)
+        else:
+            name = ()
+        index = self.indexes.get(name)
+        return index.sorted() if index is not None else []
+
+    def add_to_rollups(self, document: dict):
+        timestamp = document["timestamp"]
+        rollup = self.rollups.setdefault(
+            (document["transaction_type"], document["status"], datetime(timestamp.year, timestamp.month, timestamp.day)),
+            [0, 0.0]
+        )
+        rollup[0] += 1
+        rollup[1] += document["amount"]
+
+    async def insert_batch(
+        self,
+        chunk_index: int,
+        documents: List[dict],
+        profile: Optional[str] = None,
+        run_id: Optional[str] = None
+    ) -> BulkInsertReport:
+        report = BulkInsertReport()
+        for position, document in enumerate(documents):
+            if document["id"] in self.rows:
+                report.failed += 1
+                report.errors.append({"chunk": chunk_index, "index": position, "code": 11000, "message": f"duplicate id {document['id']}"})
+                continue
+            self.rows[document["id"]] = document
+            key = (document["timestamp"], document["id"])
+            for name in self.index_keys(document):
+                self.indexes.setdefault(name, _SortedKeys()).add(key)
+            self.add_to_rollups(document)
+            report.inserted += 1
+        return report
+
+    def page(self, filters: TransactionFilter, limit: int, skip: int = 0, after: Optional[PageKey] = None) -> List[dict]:
+        keys = self.index_for(filters)
+        # Newest-first reads walk the ascending keys backwards from `end`, down to `start`
+        end = len(keys)
+        if filters.end_date is not None:
+            end = bisect_right(keys, (filters.end_date, MAX_ID))
+        if after is not None:
+            end = min(end, bisect_left(keys, after))
+        start = bisect_left(keys, (filters.start_date,)) if filters.start_date is not None else 0
+
+        end -= skip
+        first = max(start, end - limit)
+        return [
+            {field: self.rows[key[1]][field] for field in TRANSACTION_FIELDS}
+            for key in reversed(keys[first:max(first, end)])
+        ]
+
+    async def query(
+        self,
+        filters: TransactionFilter,
+        limit: int,
+        skip: int = 0,
+        after: Optional[PageKey] = None,
+        profile: Optional[str] = None
+    ) -> List[dict]:
+        return self.page(filters, limit, skip, after)
+
+    async def stream(self, filters: TransactionFilter, batch_size: int, profile: Optional[str] = None) -> AsyncIterator[List[dict]]:
+        # Batches resume from the last key rather than a position, so writes between them can't shift rows
+        after = None
+        while True:
+            batch = self.page(filters, batch_size, after=after)
+            if not batch:
+                return
+            yield batch
+            after = (batch[-1]["timestamp"], batch[-1]["id"])
+
+    async def stats(self, since: datetime) -> dict:
+        return stats_summary(
+            [
+                {"transaction_type": transaction_type, "status": status, "day": day, "count": count, "total_amount": amount}
+                for (transaction_type, status, day), (count, amount) in self.rollups.items()
+            ],
+            since
+        )
+
+    async def rebuild_stats(self) -> int:
+        self.rollups = {}
+        for document in self.rows.values():
+            self.add_to_rollups(document)
+        return len(self.rollups)
+
+    async def clear(self) -> int:
+        count = len(self.rows)
+        self.reset()
+        return count
+
+    async def index_state(self) -> dict:
+        # Every index is maintained on write, so they are always present and current
+        return {
+            "declared": [
+                {"name": name, "key": key, "unique": name == "id_unique", "present": True, "up_to_date": True}
+                for name, key in INDEXES
+            ],
+            "unmanaged": []
+        }
@@ -0,0 +1,578 @@
+"""MongoDB backend: transactions plus (type, status, day) rollups maintained on write.
+
+With TRANSACTION_PARTITIONING=month or run, rows go to one collection per
+calendar month of their timestamp, or per generation run, instead of the
+single `transactions` collection. Runs are identified by their seed, which
+also determines the generated ids, so rerunning a seed lands in the same
+partition and its unique index still rejects the duplicates. Month
+partitions can only reject a repeated id within the same month, and a seed
+rerun with other parameters may time a row into a different one. A catalog
+records each partition's timestamp range, so reads only open the partitions
+that can match and merge them newest first, and clearing or expiring data
+drops whole collections instead of deleting documents one by one.
+
+Run partitioning suits seeded and batch loads. Reads fan out to every
+partition that overlaps the filter, which is cheap for a few large runs and
+expensive for thousands of small ones, so the API refuses unseeded interactive
+writes in that mode rather than creating a collection per call.
+
+TRANSACTION_RETENTION_DAYS adds a TTL index on `timestamp` to every
+transactions collection. A background task additionally drops partitions
+that lie entirely past the cutoff and trims rollups of expired days. Stats
+skip rollups of expired days in between passes.
+"""
+import asyncio
+import heapq
+import logging
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import AsyncIterator, Dict, List, Optional
+
+from pymongo import IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
+
+from database import close_clients, connect, get_db
+from generation import TRANSACTION_FIELDS
+from metrics import track_mongo
+from models import BulkInsertReport
+
+from .base import PageKey, TransactionFilter, TransactionStore
+
+logger = logging.getLogger(__name__)
+
+# none, month or run; see the module docstring
+TRANSACTION_PARTITIONING = os.environ.get('TRANSACTION_PARTITIONING', 'none')
+
+# Rows older than this many days are expired; 0 keeps everything
+TRANSACTION_RETENTION_DAYS = float(os.environ.get('TRANSACTION_RETENTION_DAYS', '0'))
+RETENTION_INTERVAL_SECONDS = float(os.environ.get('RETENTION_INTERVAL_SECONDS', '3600'))
+
+PARTITIONING_MODES = ["none", "month", "run"]
+
+BASE_COLLECTION = "transactions"
+PARTITION_CATALOG = "transaction_partitions"
+
+# Indexes backing the list/export filters, the timestamp sort and the date-range counts
+TRANSACTION_INDEXES = [
+    IndexModel([("id", 1)], name="id_unique", unique=True),
+    IndexModel([("timestamp", -1), ("id", -1)], name="timestamp_id"),
+    IndexModel([("transaction_type", 1), ("timestamp", -1), ("id", -1)], name="type_timestamp_id"),
+    IndexModel([("status", 1), ("timestamp", -1), ("id", -1)], name="status_timestamp_id"),
+    IndexModel([("transaction_type", 1), ("status", 1), ("timestamp", -1), ("id", -1)], name="type_status_timestamp_id"),
+]
+
+# Reads return stored documents as-is; they were validated when generated
+TRANSACTION_PROJECTION = {"_id": 0, **{field: 1 for field in TRANSACTION_FIELDS}}
+
+# Newest first, with `id` breaking ties so keyset pages never skip or repeat rows
+TRANSACTION_SORT = [("timestamp", -1), ("id", -1)]
+
+
+def index_matches(declared: IndexModel, existing: dict) -> bool:
+    spec = declared.document
+    return (
+        [tuple(key) for key in existing["key"]] == list(spec["key"].items())
+        and existing.get("unique", False) == spec.get("unique", False)
+        and existing.get("expireAfterSeconds") == spec.get("expireAfterSeconds")
+    )
+
+
+def rollup_key(transaction_type: str, status: str, day: datetime, partition: Optional[str] = None) -> dict:
+    # Field order matters: Mongo compares embedded _id documents field by field
+    key = {"transaction_type": transaction_type, "status": status, "day": day}
+    if partition is not None:
+        key["partition"] = partition
+    return key
+
+
+def rollup_updates(documents: List[dict], partition: Optional[str] = None) -> List[UpdateOne]:
+    """Fold a chunk of transactions into $inc upserts on the (type, status, day) rollups"""
+    totals = {}
+    for document in documents:
+        timestamp = document["timestamp"]
+        key = (document["transaction_type"], document["status"], datetime(timestamp.year, timestamp.month, timestamp.day))
+        count, amount = totals.get(key, (0, 0.0))
+        totals[key] = (count + 1, amount + document["amount"])
+
+    return [
+        UpdateOne(
+            {"_id": rollup_key(*key, partition)},
+            {"$inc": {"count": count, "total_amount": amount}, "$setOnInsert": rollup_key(*key, partition)},
+            upsert=True
+        )
+        for key, (count, amount) in totals.items()
+    ]
+
+
+def filter_query(filters: TransactionFilter, after: Optional[PageKey] = None) -> dict:
+    query = {}
+    if filters.start_date:
+        query["timestamp"] = {"$gte": filters.start_date}
+    if filters.end_date:
+        query.setdefault("timestamp", {})["$lte"] = filters.end_date
+    if filters.transaction_type:
+        query["transaction_type"] = filters.transaction_type
+    if filters.status:
+        query["status"] = filters.status
+    if after is not None:
+        timestamp, last_id = after
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": last_id}}
+        ]
+    return query
+
+
+def page_key(document: dict) -> PageKey:
+    return document["timestamp"], document["id"]
+
+
+class _Newest:
+    """Heap entry that pops the newest row first"""
+
+    __slots__ = ("row", "key")
+
+    def __init__(self, row: dict):
+        self.row = row
+        self.key = page_key(row)
+
+    def __lt__(self, other: "_Newest") -> bool:
+        return self.key > other.key
+
+
+async def merge_newest_first(sources: List[AsyncIterator[List[dict]]], batch_size: int) -> AsyncIterator[List[dict]]:
+    """K-way merge of newest-first batch streams, holding one batch per source"""
+    pending = [deque() for _ in sources]
+    heap = []
+
+    async def push_next(source: int):
+        if not pending[source]:
+            try:
+                pending[source].extend(await sources[source].__anext__())
+            except StopAsyncIteration:
+                return
+        heapq.heappush(heap, (_Newest(pending[source].popleft()), source))
+
+    for source in range(len(sources)):
+        await push_next(source)
+
+    batch = []
+    while heap:
+        newest, source = heapq.heappop(heap)
+        batch.append(newest.row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+        await push_next(source)
+    if batch:
+        yield batch
+
+
+class MongoStore(TransactionStore):
+    name = "mongo"
+
+    def __init__(self, partitioning: Optional[str] = None, retention_days: Optional[float] = None):
+        self.partitioning = partitioning or TRANSACTION_PARTITIONING
+        if self.partitioning not in PARTITIONING_MODES:
+            raise ValueError(f"Unknown partitioning: {self.partitioning}, expected one of {', '.join(PARTITIONING_MODES)}")
+        self.retention_days = TRANSACTION_RETENTION_DAYS if retention_days is None else retention_days
+        # Partitions whose indexes this process has already reconciled
+        self.ready_partitions = set()
+        self.retention_task: Optional[asyncio.Task] = None
+
+    @property
+    def partitioned(self) -> bool:
+        return self.partitioning != "none"
+
+    @property
+    def partitions_per_run(self) -> bool:
+        return self.partitioning == "run"
+
+    def retention_cutoff(self) -> Optional[datetime]:
+        if not self.retention_days:
+            return None
+        return datetime.utcnow() - timedelta(days=self.retention_days)
+
+    def declared_indexes(self) -> List[IndexModel]:
+        if not self.retention_days:
+            return TRANSACTION_INDEXES
+        ttl = IndexModel([("timestamp", 1)], name="timestamp_ttl", expireAfterSeconds=int(self.retention_days * 86400))
+        return TRANSACTION_INDEXES + [ttl]
+
+    async def setup(self):
+        connect()
+
+        try:
+            if self.partitioned:
+                await self.adopt_base_collection()
+            for name in await self.partition_names():
+                await self.ensure_indexes(name)
+                self.ready_partitions.add(name)
+        except PyMongoError as e:
+            logger.error(f"Index reconciliation failed: {e}")
+
+        # Collections populated before rollups existed would otherwise report empty stats
+        try:
+            if not await get_db().transaction_rollups.find_one() and await self.has_transactions():
+                count = await self.rebuild_stats()
+                logger.info(f"Backfilled {count} transaction rollups")
+        except PyMongoError as e:
+            logger.error(f"Rollup backfill failed: {e}")
+
+        if self.retention_days:
+            self.retention_task = asyncio.create_task(self.retention_loop())
+
+    async def close(self):
+        if self.retention_task is not None:
+            self.retention_task.cancel()
+            self.retention_task = None
+        close_clients()
+
+    async def adopt_base_collection(self):
+        """Register rows written before partitioning was enabled as a partition of their own"""
+        collection = get_db()[BASE_COLLECTION]
+        if await get_db()[PARTITION_CATALOG].find_one({"_id": BASE_COLLECTION}):
+            return
+        newest = await collection.find_one({}, sort=[("timestamp", -1)])
+        if newest is None:
+            return
+        oldest = await collection.find_one({}, sort=[("timestamp", 1)])
+        await get_db()[PARTITION_CATALOG].insert_one({
+            "_id": BASE_COLLECTION,
+            "min_timestamp": oldest["timestamp"],
+            "max_timestamp": newest["timestamp"],
+            "count": await collection.estimated_document_count(),
+            "created_at": datetime.utcnow()
+        })
+        logger.info(f"Registered existing {BASE_COLLECTION} collection as a partition")
+
+    async def has_transactions(self) -> bool:
+        for name in await self.partition_names():
+            if await get_db()[name].find_one():
+                return True
+        return False
+
+    async def ensure_indexes(self, collection_name: str = BASE_COLLECTION) -> List[str]:
+        """Create missing transaction indexes and rebuild ones whose definition changed"""
+        collection = get_db()[collection_name]
+        existing = await collection.index_information()
+        declared_indexes = self.declared_indexes()
+        built = []
+
+        for declared in declared_indexes:
+            name = declared.document["name"]
+            if name in existing:
+                if index_matches(declared, existing[name]):
+                    continue
+                logger.info(f"Index {name} on {collection_name} does not match its declaration, rebuilding")
+                await collection.drop_index(name)
+            try:
+                await collection.create_indexes([declared])
+            except OperationFailure as e:
+                logger.error(f"Could not build index {name} on {collection_name}: {e}")
+                continue
+            logger.info(f"Built index {name} on {collection_name}")
+            built.append(name)
+
+        declared_names = {declared.document["name"] for declared in declared_indexes}
+        for name in existing.keys() - declared_names - {"_id_"}:
+            logger.info(f"Leaving unmanaged index {name} on {collection_name} in place")
+
+        return built
+
+    async def index_state(self) -> dict:
+        """Declared indexes; with partitioning, present only when every partition has them"""
+        declared_indexes = self.declared_indexes()
+        declared_names = {declared.document["name"] for declared in declared_indexes}
+        names = await self.partition_names()
+        existing = [await get_db()[name].index_information() for name in names]
+        return {
+            "declared": [
+                {
+                    "name": declared.document["name"],
+                    "key": list(declared.document["key"].items()),
+                    "unique": declared.document.get("unique", False),
+                    "present": all(declared.document["name"] in indexes for indexes in existing),
+                    "up_to_date": all(
+                        declared.document["name"] in indexes and index_matches(declared, indexes[declared.document["name"]])
+                        for indexes in existing
+                    )
+                }
+                for declared in declared_indexes
+            ],
+            "unmanaged": sorted(set().union(*(indexes.keys() for indexes in existing)) - declared_names - {"_id_"}),
+            "partitions": len(names)
+        }
+
+    def partition_for(self, document: dict, run_id: Optional[str]) -> str:
+        if self.partitioning == "month":
+            timestamp = document["timestamp"]
+            return f"{BASE_COLLECTION}_{timestamp.year:04d}_{timestamp.month:02d}"
+        if self.partitioning == "run":
+            return f"{BASE_COLLECTION}_run_{run_id or 'default'}"
+        return BASE_COLLECTION
+
+    async def partition_names(self, filters: Optional[TransactionFilter] = None, after: Optional[PageKey] = None) -> List[str]:
+        """Partitions whose timestamp range can hold matching rows, newest first"""
+        if not self.partitioned:
+            return [BASE_COLLECTION]
+
+        query = {}
+        upper = filters.end_date if filters is not None else None
+        if after is not None:
+            upper = min(upper, after[0]) if upper is not None else after[0]
+        if upper is not None:
+            query["min_timestamp"] = {"$lte": upper}
+        if filters is not None and filters.start_date is not None:
+            query["max_timestamp"] = {"$gte": filters.start_date}
+        catalog = await get_db()[PARTITION_CATALOG].find(query, {"_id": 1}).sort("max_timestamp", -1).to_list(None)
+        return [entry["_id"] for entry in catalog]
+
+    async def partitions(self) -> List[dict]:
+        if not self.partitioned:
+            count = await get_db()[BASE_COLLECTION].estimated_document_count()
+            return [{"name": BASE_COLLECTION, "count": count}]
+        catalog = await get_db()[PARTITION_CATALOG].find().sort("max_timestamp", -1).to_list(None)
+        return [{"name": entry.pop("_id"), **entry} for entry in catalog]
+
+    async def update_rollups(self, chunk_index: int, documents: List[dict], profile: Optional[str] = None, partition: Optional[str] = None):
+        if not documents:
+            return
+        try:
+            with track_mongo("rollup_bulk_write"):
+                await get_db(profile).transaction_rollups.bulk_write(rollup_updates(documents, partition), ordered=False)
+        except PyMongoError as e:
+            logger.error(f"Rollup update for chunk {chunk_index} failed, stats will drift until rollups are rebuilt: {e}")
+
+    async def update_catalog(self, name: str, documents: List[dict], profile: Optional[str] = None):
+        if not documents:
+            return
+        timestamps = [document["timestamp"] for document in documents]
+        await get_db(profile)[PARTITION_CATALOG].update_one(
+            {"_id": name},
+            {
+                "$min": {"min_timestamp": min(timestamps)},
+                "$max": {"max_timestamp": max(timestamps)},
+                "$inc": {"count": len(documents)},
+                "$setOnInsert": {"created_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+    async def insert_batch(
+        self,
+        chunk_index: int,
+        documents: List[dict],
+        profile: Optional[str] = None,
+        run_id: Optional[str] = None
+    ) -> BulkInsertReport:
+        if not self.partitioned:
+            return await self.insert_partition(BASE_COLLECTION, chunk_index, documents, range(len(documents)), profile)
+
+        positions: Dict[str, List[int]] = {}
+        for position, document in enumerate(documents):
+            positions.setdefault(self.partition_for(document, run_id), []).append(position)
+
+        report = BulkInsertReport()
+        for name, indexes in positions.items():
+            if name not in self.ready_partitions:
+                await self.ensure_indexes(name)
+                self.ready_partitions.add(name)
+            report.add(await self.insert_partition(name, chunk_index, [documents[i] for i in indexes], indexes, profile))
+        return report
+
+    async def insert_partition(self, name: str, chunk_index: int, documents: List[dict], positions, profile: Optional[str]) -> BulkInsertReport:
+        """Insert rows into one collection with an unordered insert_many, then record what was written.
+
+        `positions` maps each document back to its index in the original chunk for error reports.
+        """
+        partition = name if self.partitioned else None
+        try:
+            with track_mongo("insert_many"):
+                result = await get_db(profile)[name].insert_many(documents, ordered=False)
+            written = documents
+            report = BulkInsertReport(inserted=len(result.inserted_ids))
+        except BulkWriteError as e:
+            # Unordered inserts keep going past bad documents, so only the listed ones are lost
+            write_errors = e.details.get("writeErrors", [])
+            failed_indexes = {error.get("index") for error in write_errors}
+            written = [document for i, document in enumerate(documents) if i not in failed_indexes]
+            report = BulkInsertReport(
+                inserted=e.details.get("nInserted", 0),
+                failed=len(write_errors),
+                errors=[
+                    {"chunk": chunk_index, "index": positions[error.get("index")], "code": error.get("code"), "message": error.get("errmsg")}
+                    for error in write_errors
+                ]
+            )
+        except PyMongoError as e:
+            return BulkInsertReport(
+                failed=len(documents),
+                errors=[{"chunk": chunk_index, "index": None, "code": None, "message": str(e)}]
+            )
+
+        await self.update_rollups(chunk_index, written, profile, partition)
+        if self.partitioned:
+            try:
+                await self.update_catalog(name, written, profile)
+            except PyMongoError as e:
+                logger.error(f"Catalog update for partition {name} failed, reads may skip its new rows: {e}")
+        return report
+
+    async def query(
+        self,
+        filters: TransactionFilter,
+        limit: int,
+        skip: int = 0,
+        after: Optional[PageKey] = None,
+        profile: Optional[str] = None
+    ) -> List[dict]:
+        names = await self.partition_names(filters, after)
+
+        async def read(name: str, skip: int, limit: int) -> List[dict]:
+            cursor = get_db(profile)[name].find(filter_query(filters, after), TRANSACTION_PROJECTION).sort(TRANSACTION_SORT)
+            if skip:
+                cursor = cursor.skip(skip)
+            with track_mongo("find"):
+                return await cursor.limit(limit).to_list(limit)
+
+        if len(names) == 1:
+            return await read(names[0], skip, limit)
+        # Any partition may hold rows of the requested page, so take the head of each and merge
+        pages = await asyncio.gather(*(read(name, 0, skip + limit) for name in names))
+        return list(islice(heapq.merge(*pages, key=page_key, reverse=True), skip, skip + limit))
+
+    async def stream_partition(self, name: str, filters: TransactionFilter, batch_size: int, profile: Optional[str]) -> AsyncIterator[List[dict]]:
+        cursor = get_db(profile)[name].find(filter_query(filters), TRANSACTION_PROJECTION, batch_size=batch_size).sort(TRANSACTION_SORT)
+        while True:
+            with track_mongo("export_batch"):
+                batch = await cursor.to_list(batch_size)
+            if not batch:
+                return
+            yield batch
+
+    async def stream(self, filters: TransactionFilter, batch_size: int, profile: Optional[str] = None) -> AsyncIterator[List[dict]]:
+        names = await self.partition_names(filters)
+        sources = [self.stream_partition(name, filters, batch_size, profile) for name in names]
+        batches = sources[0] if len(sources) == 1 else merge_newest_first(sources, batch_size)
+        async for batch in batches:
+            yield batch
+
+    async def stats(self, since: datetime) -> dict:
+        """Dashboard statistics from the rollups; cost depends on the number of rollup rows only"""
+        pipeline = []
+        cutoff = self.retention_cutoff()
+        if cutoff is not None:
+            # Days the TTL index has emptied may still have rollups until the next retention pass
+            pipeline.append({"$match": {"day": {"$gte": datetime(cutoff.year, cutoff.month, cutoff.day)}}})
+        pipeline += [
+            {"$facet": {
+                "total": [{"$group": {"_id": None, "count": {"$sum": "$count"}}}],
+                "recent": [{"$match": {"day": {"$gte": since}}}, {"$group": {"_id": None, "count": {"$sum": "$count"}}}],
+                "by_type": [{"$group": {"_id": "$transaction_type", "count": {"$sum": "$count"}, "total_amount": {"$sum": "$total_amount"}}}],
+                "by_status": [{"$group": {"_id": "$status", "count": {"$sum": "$count"}}}]
+            }}
+        ]
+        with track_mongo("aggregate"):
+            facets = (await get_db().transaction_rollups.aggregate(pipeline).to_list(1))[0]
+
+        return {
+            "total_transactions": facets["total"][0]["count"] if facets["total"] else 0,
+            "recent_transactions": facets["recent"][0]["count"] if facets["recent"] else 0,
+            "by_type": {stat["_id"]: {"count": stat["count"], "total_amount": stat.get("total_amount", 0)} for stat in facets["by_type"]},
+            "by_status": {stat["_id"]: stat["count"] for stat in facets["by_status"]}
+        }
+
+    async def rebuild_stats(self) -> int:
+        """Recompute every rollup from the raw transactions"""
+        rollups = []
+        for name in await self.partition_names():
+            key = {
+                "transaction_type": "$transaction_type",
+                "status": "$status",
+                "day": {"$dateFromParts": {
+                    "year": {"$year": "$timestamp"},
+                    "month": {"$month": "$timestamp"},
+                    "day": {"$dayOfMonth": "$timestamp"}
+                }}
+            }
+            fields = {"transaction_type": "$_id.transaction_type", "status": "$_id.status", "day": "$_id.day"}
+            if self.partitioned:
+                key["partition"] = {"$literal": name}
+                fields["partition"] = "$_id.partition"
+            pipeline = [
+                {"$group": {"_id": key, "count": {"$sum": 1}, "total_amount": {"$sum": "$amount"}}},
+                {"$addFields": fields}
+            ]
+            rollups += await get_db()[name].aggregate(pipeline).to_list(None)
+        await get_db().transaction_rollups.delete_many({})
+        if rollups:
+            await get_db().transaction_rollups.insert_many(rollups)
+        return len(rollups)
+
+    async def drop_partition(self, name: str) -> Optional[int]:
+        """Drop one partition with its rollups and catalog entry, returning its row count"""
+        if not self.partitioned or not await get_db()[PARTITION_CATALOG].find_one({"_id": name}):
+            return None
+        count = await get_db()[name].estimated_document_count()
+        with track_mongo("drop"):
+            await get_db()[name].drop()
+        await get_db().transaction_rollups.delete_many({"partition": name})
+        await get_db()[PARTITION_CATALOG].delete_one({"_id": name})
+        self.ready_partitions.discard(name)
+        return count
+
+    async def clear(self) -> int:
+        """Drop every transactions collection; far cheaper than deleting documents"""
+        count = 0
+        for name in await self.partition_names():
+            count += await get_db()[name].estimated_document_count()
+            with track_mongo("drop"):
+                await get_db()[name].drop()
+        await get_db().transaction_rollups.drop()
+        self.ready_partitions.clear()
+        if self.partitioned:
+            await get_db()[PARTITION_CATALOG].drop()
+        else:
+            # Writes expect the unique index to be in place before the first insert
+            await self.ensure_indexes()
+        return count
+
+    async def apply_retention(self) -> dict:
+        """Drop partitions entirely past the retention cutoff and trim rollups of expired days.
+
+        TTL indexes remove expired rows from live collections on their own. Rollups
+        are kept per day, so a day is only trimmed once all of it has expired.
+        """
+        cutoff = self.retention_cutoff()
+        if cutoff is None:
+            return {"dropped_partitions": [], "trimmed_rollups": 0}
+
+        dropped = []
+        trimmed = 0
+        if self.partitioned:
+            expired = await get_db()[PARTITION_CATALOG].find({"max_timestamp": {"$lt": cutoff}}, {"_id": 1}).to_list(None)
+            dropped = [entry["_id"] for entry in expired]
+            if dropped:
+                # Dropping a partition takes its rollups with it, so stats lose its rows at once
+                trimmed = await get_db().transaction_rollups.count_documents({"partition": {"$in": dropped}})
+            for name in dropped:
+                await self.drop_partition(name)
+
+        result = await get_db().transaction_rollups.delete_many({"day": {"$lt": datetime(cutoff.year, cutoff.month, cutoff.day)}})
+        return {"dropped_partitions": dropped, "trimmed_rollups": trimmed + result.deleted_count}
+
+    async def retention_loop(self):
+        while True:
+            try:
+                result = await self.apply_retention()
+                if result["dropped_partitions"] or result["trimmed_rollups"]:
+                    logger.info(
+                        f"Retention dropped {len(result['dropped_partitions'])} partitions "
+                        f"and trimmed {result['trimmed_rollups']} rollups"
+                    )
+            except PyMongoError as e:
+                logger.error(f"Retention pass failed: {e}")
+            await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
@@ -0,0 +1,285 @@
+"""PostgreSQL backend through SQLAlchemy Core.
+
+Batches are bulk loaded with COPY into a temporary staging table, then moved
+into `transactions` with one INSERT ... ON CONFLICT DO NOTHING that also folds
+the rows it actually inserted into the (type, status, day) rollups, so a
+batch costs three round trips whatever its size. SQLAlchemy and psycopg2 are
+synchronous; every call runs on a worker thread to keep the event loop free.
+"""
+import asyncio
+import csv
+import io
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Float, Index, MetaData, String, Table, create_engine, func, inspect, select, text,
+    tuple_
+)
+
+from generation import TRANSACTION_FIELDS
+from models import BulkInsertReport
+
+from .base import PageKey, TransactionFilter, TransactionStore, stats_summary
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+transactions = Table(
+    "transactions", metadata,
+    Column("id", String, primary_key=True),
+    Column("transaction_id", String, nullable=False),
+    Column("transaction_type", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("amount", Float(53), nullable=False),
+    Column("currency", String, nullable=False),
+    Column("fee", Float(53), nullable=False),
+    Column("net_amount", Float(53), nullable=False),
+    Column("payer_email", String, nullable=False),
+    Column("payer_name", String, nullable=False),
+    Column("recipient_email", String, nullable=False),
+    Column("recipient_name", String, nullable=False),
+    Column("merchant_id", String, nullable=False),
+    Column("description", String, nullable=False),
+    Column("invoice_id", String),
+    Column("parent_transaction_id", String),
+    Column("timestamp", DateTime, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+# Same shapes as the Mongo indexes: every filter combination sorted newest first
+TRANSACTION_INDEXES = [
+    Index("timestamp_id", transactions.c.timestamp.desc(), transactions.c.id.desc()),
+    Index("type_timestamp_id", transactions.c.transaction_type, transactions.c.timestamp.desc(), transactions.c.id.desc()),
+    Index("status_timestamp_id", transactions.c.status, transactions.c.timestamp.desc(), transactions.c.id.desc()),
+    Index(
+        "type_status_timestamp_id",
+        transactions.c.transaction_type, transactions.c.status, transactions.c.timestamp.desc(), transactions.c.id.desc()
+    ),
+]
+
+transaction_rollups = Table(
+    "transaction_rollups", metadata,
+    Column("transaction_type", String, primary_key=True),
+    Column("status", String, primary_key=True),
+    Column("day", DateTime, primary_key=True),
+    Column("count", BigInteger, nullable=False),
+    Column("total_amount", Float(53), nullable=False),
+)
+
+COLUMNS = ", ".join(f'"{field}"' for field in TRANSACTION_FIELDS)
+
+CREATE_STAGING = "CREATE TEMPORARY TABLE transactions_staging (LIKE transactions) ON COMMIT DROP"
+COPY_STAGING = f"COPY transactions_staging ({COLUMNS}) FROM STDIN WITH (FORMAT csv)"
+MERGE_STAGING = f"""
+WITH inserted AS (
+    INSERT INTO transactions ({COLUMNS})
+    SELECT {COLUMNS} FROM transactions_staging
+    ON CONFLICT (id) DO NOTHING
+    RETURNING transaction_type, status, "timestamp", amount
+), rolled_up AS (
+    INSERT INTO transaction_rollups (transaction_type, status, day, count, total_amount)
+    SELECT transaction_type, status, date_trunc('day', "timestamp"), count(*), sum(amount)
+    FROM inserted
+    GROUP BY 1, 2, 3
+    ON CONFLICT (transaction_type, status, day) DO UPDATE SET
+        count = transaction_rollups.count + EXCLUDED.count,
+        total_amount = transaction_rollups.total_amount + EXCLUDED.total_amount
+)
+SELECT count(*) FROM inserted
+"""
+# Columns added after the table was first shipped; create_all leaves existing tables alone
+ADD_COLUMNS = ['ALTER TABLE transactions ADD COLUMN IF NOT EXISTS parent_transaction_id varchar']
+REBUILD_ROLLUPS = """
+INSERT INTO transaction_rollups (transaction_type, status, day, count, total_amount)
+SELECT transaction_type, status, date_trunc('day', "timestamp"), count(*), sum(amount)
+FROM transactions
+GROUP BY 1, 2, 3
+"""
+
+
+def csv_rows(documents: List[dict]) -> io.StringIO:
+    """Documents as COPY csv input; None becomes an unquoted empty field, which COPY reads as NULL"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([document[field] for field in TRANSACTION_FIELDS] for document in documents)
+    buffer.seek(0)
+    return buffer
+
+
+def as_dicts(rows, keys=None) -> List[dict]:
+    """Rows as plain dicts; orjson rejects SQLAlchemy's str subclasses as keys"""
+    keys = [str(key) for key in (keys if keys is not None else rows.keys())]
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def conditions(filters: TransactionFilter, after: Optional[PageKey] = None) -> list:
+    clauses = []
+    if filters.start_date:
+        clauses.append(transactions.c.timestamp >= filters.start_date)
+    if filters.end_date:
+        clauses.append(transactions.c.timestamp <= filters.end_date)
+    if filters.transaction_type:
+        clauses.append(transactions.c.transaction_type == filters.transaction_type)
+    if filters.status:
+        clauses.append(transactions.c.status == filters.status)
+    if after is not None:
+        clauses.append(tuple_(transactions.c.timestamp, transactions.c.id) < tuple_(*after))
+    return clauses
+
+
+def ordered_select(filters: TransactionFilter, after: Optional[PageKey] = None):
+    return (
+        select(*(transactions.c[field] for field in TRANSACTION_FIELDS))
+        .where(*conditions(filters, after))
+        .order_by(transactions.c.timestamp.desc(), transactions.c.id.desc())
+    )
+
+
+class SQLStore(TransactionStore):
+    name = "sql"
+
+    def __init__(self, url: Optional[str] = None):
+        url = url or os.environ.get('SQL_DATABASE_URL')
+        if not url:
+            raise ValueError("The sql storage backend needs SQL_DATABASE_URL")
+        self.engine = create_engine(
+            url,
+            pool_size=int(os.environ.get('SQL_POOL_SIZE', '10')),
+            max_overflow=int(os.environ.get('SQL_MAX_OVERFLOW', '10')),
+            pool_pre_ping=True
+        )
+        if self.engine.dialect.name != "postgresql":
+            raise ValueError(f"The sql storage backend needs PostgreSQL, not {self.engine.dialect.name}")
+
+    def _setup(self):
+        metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            for statement in ADD_COLUMNS:
+                connection.execute(text(statement))
+
+    async def setup(self):
+        await asyncio.to_thread(self._setup)
+
+    async def close(self):
+        await asyncio.to_thread(self.engine.dispose)
+
+    def _copy_batch(self, documents: List[dict]) -> int:
+        connection = self.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(CREATE_STAGING)
+                cursor.copy_expert(COPY_STAGING, csv_rows(documents))
+                cursor.execute(MERGE_STAGING)
+                inserted = cursor.fetchone()[0]
+            connection.commit()
+            return inserted
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    async def insert_batch(
+        self,
+        chunk_index: int,
+        documents: List[dict],
+        profile: Optional[str] = None,
+        run_id: Optional[str] = None
+    ) -> BulkInsertReport:
+        if not documents:
+            return BulkInsertReport()
+        try:
+            inserted = await asyncio.to_thread(self._copy_batch, documents)
+        except self.engine.dialect.dbapi.Error as e:
+            return BulkInsertReport(
+                failed=len(documents),
+                errors=[{"chunk": chunk_index, "index": None, "code": getattr(e, "pgcode", None), "message": str(e)}]
+            )
+
+        report = BulkInsertReport(inserted=inserted, failed=len(documents) - inserted)
+        if report.failed:
+            # ON CONFLICT skips rows silently, so individual positions are not known
+            report.errors.append({
+                "chunk": chunk_index, "index": None, "code": "23505",
+                "message": f"{report.failed} rows skipped because their id already exists"
+            })
+        return report
+
+    def _fetch(self, statement) -> List[dict]:
+        with self.engine.connect() as connection:
+            return as_dicts(connection.execute(statement))
+
+    async def query(
+        self,
+        filters: TransactionFilter,
+        limit: int,
+        skip: int = 0,
+        after: Optional[PageKey] = None,
+        profile: Optional[str] = None
+    ) -> List[dict]:
+        statement = ordered_select(filters, after).limit(limit)
+        if skip:
+            statement = statement.offset(skip)
+        return await asyncio.to_thread(self._fetch, statement)
+
+    async def stream(self, filters: TransactionFilter, batch_size: int, profile: Optional[str] = None) -> AsyncIterator[List[dict]]:
+        # A server-side cursor keeps memory bounded by one batch on both ends
+        connection = await asyncio.to_thread(self.engine.connect)
+        try:
+            result = await asyncio.to_thread(
+                connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute,
+                ordered_select(filters)
+            )
+            while True:
+                rows = await asyncio.to_thread(result.fetchmany, batch_size)
+                if not rows:
+                    return
+                yield as_dicts(rows, result.keys())
+        finally:
+            await asyncio.to_thread(connection.close)
+
+    async def stats(self, since: datetime) -> dict:
+        rollups = await asyncio.to_thread(self._fetch, select(transaction_rollups))
+        return stats_summary(rollups, since)
+
+    def _rebuild_stats(self) -> int:
+        with self.engine.begin() as connection:
+            connection.execute(transaction_rollups.delete())
+            connection.execute(text(REBUILD_ROLLUPS))
+            return connection.execute(select(func.count()).select_from(transaction_rollups)).scalar_one()
+
+    async def rebuild_stats(self) -> int:
+        return await asyncio.to_thread(self._rebuild_stats)
+
+    def _clear(self) -> int:
+        with self.engine.begin() as connection:
+            count = connection.execute(select(func.count()).select_from(transactions)).scalar_one()
+            connection.execute(text("TRUNCATE transactions, transaction_rollups"))
+            return count
+
+    async def clear(self) -> int:
+        return await asyncio.to_thread(self._clear)
+
+    def _index_names(self) -> set:
+        return {index["name"] for index in inspect(self.engine).get_indexes("transactions")}
+
+    async def index_state(self) -> dict:
+        existing = await asyncio.to_thread(self._index_names)
+        declared_names = {index.name for index in TRANSACTION_INDEXES}
+        return {
+            "declared": [
+                {
+                    "name": index.name,
+                    "key": [str(expression) for expression in index.expressions],
+                    "unique": bool(index.unique),
+                    "present": index.name in existing,
+                    "up_to_date": index.name in existing
+                }
+                for index in TRANSACTION_INDEXES
+            ],
+            "unmanaged": sorted(existing - declared_names)
+        }
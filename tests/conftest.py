@@ -0,0 +1,59 @@
+"""Shared fixtures: the FastAPI app on the in-memory storage backend, driven in-process through httpx"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# Settings are read when the backend modules are imported, so they go in before any test imports them
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "transaction_generator_test")
+# A small entity pool builds in milliseconds; nothing under test depends on its size
+os.environ.setdefault("ENTITY_POOL_PEOPLE", "2000")
+os.environ.setdefault("ENTITY_POOL_MERCHANTS", "200")
+os.environ.setdefault("ENTITY_CACHE_DIR", tempfile.mkdtemp(prefix="transaction-generator-entities-"))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def app():
+    """The app with a fresh store from STORAGE_BACKEND and no cached stats"""
+    import server
+    from storage import set_store
+
+    set_store(None)
+    server.invalidate_stats()
+    yield server.app
+    set_store(None)
+
+
+@pytest.fixture
+async def job_manager(app, monkeypatch):
+    """Running job workers for the app, as the lifespan would start them, on this test's event loop"""
+    import server
+    from jobs import JobManager
+
+    manager = JobManager(server.run_generation_job, workers=server.JOB_WORKERS, queue_size=server.JOB_QUEUE_SIZE)
+    monkeypatch.setattr(server, "job_manager", manager)
+    manager.start()
+    yield manager
+    await manager.stop()
+
+
+@pytest.fixture
+async def client(app):
+    import httpx
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
@@ -0,0 +1,49 @@
+"""Request helpers and generation parameters shared by the tests"""
+import asyncio
+from datetime import datetime
+
+# Fixed end of the timestamp window, so seeded runs reproduce exactly
+REFERENCE_TIME = "2026-10-10T00:00:00"
+NOW = datetime.fromisoformat(REFERENCE_TIME)
+
+# TransactionGenerateRequest.generation_params() of a default request
+PARAMS = {
+    "transaction_type": None, "status": None, "min_amount": 1.0, "max_amount": 1000.0,
+    "currency": "USD", "days_back": 30, "scenario": None
+}
+
+
+async def generate(client, count: int, seed: int, **params) -> list:
+    """POST /api/transactions/generate and return the stored transactions"""
+    response = await client.post(
+        "/api/transactions/generate",
+        json={"count": count, "seed": seed, "reference_time": REFERENCE_TIME, **params}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def wait_for_job(client, job_id: str, condition, timeout: float = 20.0) -> dict:
+    """Poll GET /api/jobs/{job_id} until `condition` holds for its snapshot"""
+    async def poll():
+        while True:
+            job = (await client.get(f"/api/jobs/{job_id}")).json()
+            if condition(job):
+                return job
+            await asyncio.sleep(0.01)
+
+    return await asyncio.wait_for(poll(), timeout)
+
+
+async def walk_pages(client, limit: int, **params) -> list:
+    """Every transaction GET /api/transactions returns when following X-Next-Cursor to the end"""
+    rows = []
+    cursor = None
+    while True:
+        query = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/transactions", params=query)
+        assert response.status_code == 200, response.text
+        rows += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return rows
@@ -0,0 +1,55 @@
+"""Pipelined bulk inserts: rows that fail are reported per chunk and never stop the rest of a run"""
+import pytest
+
+from tests.helpers import NOW, PARAMS
+
+pytestmark = pytest.mark.anyio
+
+
+async def chunked(documents: list, size: int):
+    for start in range(0, len(documents), size):
+        yield documents[start:start + size]
+
+
+def documents(seed: int, count: int) -> list:
+    from generation import generate_seeded_documents
+
+    return generate_seeded_documents(seed, 0, count, NOW, PARAMS)
+
+
+async def test_duplicates_fail_alone_and_are_reported_per_chunk(app):
+    import server
+    from storage import get_store
+
+    rows = documents(1, 1000)
+    await get_store().insert_batch(0, rows[100:150] + rows[620:630])
+
+    reports = []
+    report = await server.bulk_insert_transactions(chunked(rows, 250), on_chunk=reports.append)
+    assert (report.inserted, report.failed) == (940, 60)
+    assert [(chunk.inserted, chunk.failed) for chunk in reports] == [(200, 50), (250, 0), (240, 10), (250, 0)]
+    assert {(error["chunk"], error["index"]) for error in report.errors} == (
+        {(0, index) for index in range(100, 150)} | {(2, index) for index in range(120, 130)}
+    )
+    assert report.has_duplicates()
+    assert len(await get_store().query(server.TransactionFilter(), 2000)) == 1000
+
+
+async def test_a_failing_chunk_does_not_stop_the_run(app):
+    import server
+    from models import BulkInsertReport
+    from storage import get_store
+
+    store = get_store()
+    insert_batch = store.insert_batch
+
+    async def flaky_insert(chunk_index, documents, profile=None, run_id=None):
+        if chunk_index == 1:
+            return BulkInsertReport(failed=len(documents), errors=[{"chunk": 1, "index": None, "code": None, "message": "connection reset"}])
+        return await insert_batch(chunk_index, documents, profile, run_id)
+
+    store.insert_batch = flaky_insert
+    report = await server.bulk_insert_transactions(chunked(documents(2, 900), 300))
+    assert (report.inserted, report.failed) == (600, 300)
+    assert not report.has_duplicates()
+    assert len(await store.query(server.TransactionFilter(), 2000)) == 600
@@ -0,0 +1,67 @@
+"""Offline CLI: shards written in parallel hold the same rows as the seeded API run"""
+import csv
+import json
+
+import pytest
+
+from tests.helpers import NOW, PARAMS, REFERENCE_TIME
+
+
+def run_cli(tmp_path, *args) -> list:
+    import cli
+
+    assert cli.main(["--output", str(tmp_path), "--seed", "9", "--reference-time", REFERENCE_TIME, *args]) == 0
+    return sorted(tmp_path.iterdir())
+
+
+def seeded_ids(count: int) -> list:
+    from generation import generate_seeded_documents, seeded_chunk_count
+
+    return [
+        document["id"]
+        for chunk_index in range(seeded_chunk_count(count))
+        for document in generate_seeded_documents(9, chunk_index, count, NOW, PARAMS)
+    ]
+
+
+def test_shards_split_whole_chunks_evenly():
+    from cli import shard_ranges
+
+    assert list(shard_ranges(10, 3)) == [(0, 0, 4), (1, 4, 7), (2, 7, 10)]
+    assert list(shard_ranges(2, 8)) == [(0, 0, 1), (1, 1, 2)]
+
+
+def test_ndjson_shards_concatenate_to_the_seeded_run(tmp_path):
+    paths = run_cli(tmp_path, "--count", "3500", "--workers", "2", "--shards", "3")
+    assert [path.name for path in paths] == [f"transactions-0000{shard}.ndjson" for shard in range(3)]
+
+    rows = [json.loads(line) for path in paths for line in path.read_text().splitlines()]
+    assert [row["id"] for row in rows] == seeded_ids(3500)
+
+
+def test_csv_shards_each_have_a_header(tmp_path):
+    paths = run_cli(tmp_path, "--count", "2500", "--workers", "1", "--shards", "2", "--format", "csv")
+    rows = [row for path in paths for row in csv.DictReader(path.open())]
+    assert [row["id"] for row in rows] == seeded_ids(2500)
+
+
+def test_parquet_shards(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    paths = run_cli(tmp_path, "--count", "1500", "--workers", "1", "--format", "parquet")
+    assert [path.suffix for path in paths] == [".parquet"]
+    assert pq.read_table(paths[0]).column("id").to_pylist() == seeded_ids(1500)
+
+
+@pytest.mark.parametrize("args", [
+    ["--count", "0"],
+    ["--count", "10", "--min-amount", "50", "--max-amount", "5"],
+    ["--count", "10", "--seed", str(2**64)],
+    ["--count", "10", "--scenario", "no-such-scenario"],
+])
+def test_invalid_arguments_exit_with_an_error(tmp_path, args):
+    import cli
+
+    with pytest.raises(SystemExit) as exit:
+        cli.main(["--output", str(tmp_path), *args])
+    assert exit.value.code != 0
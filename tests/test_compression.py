@@ -0,0 +1,83 @@
+"""gzip/zstd compression: negotiated transfer encodings, compressed downloads and live streams"""
+import gzip
+import importlib.util
+import json
+import zlib
+
+import pytest
+
+from tests.helpers import REFERENCE_TIME, generate
+
+pytestmark = pytest.mark.anyio
+
+ENCODINGS = ["gzip", pytest.param("zstd", marks=pytest.mark.skipif(
+    importlib.util.find_spec("zstandard") is None, reason="zstandard is not installed"
+))]
+
+
+def decompressor(encoding: str):
+    if encoding == "gzip":
+        return zlib.decompressobj(31)
+    import zstandard
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0, deflate", None),
+    ("deflate, *", "zstd"),
+    ("identity", None),
+])
+def test_negotiation_prefers_zstd_then_gzip(header, expected):
+    from compression import negotiate_encoding, zstd_available
+
+    if expected == "zstd" and not zstd_available():
+        expected = "gzip"
+    assert negotiate_encoding(header) == expected
+
+
+async def test_large_json_responses_are_compressed(client):
+    await generate(client, 200, 1)
+    response = await client.get("/api/transactions", params={"limit": 200}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 200
+
+    small = await client.get("/api/transactions", params={"limit": 1}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+
+async def test_compressed_downloads_are_files_not_transfer_encodings(client):
+    await generate(client, 300, 2)
+    response = await client.post("/api/transactions/export", json={"format": "ndjson", "compression": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-disposition"] == "attachment; filename=transactions.ndjson.gz"
+    assert len(gzip.decompress(response.content).splitlines()) == 300
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+async def test_every_streamed_chunk_decodes_to_whole_rows_before_the_stream_ends(app, encoding):
+    import server
+    from models import TransactionStreamRequest
+
+    # Ten rows a chunk, paced at 100 rows a second
+    response = await server.stream_transactions(TransactionStreamRequest(count=30, rate=100), encoding)
+    assert response.headers["content-encoding"] == encoding
+
+    decoder = decompressor(encoding)
+    rows_per_chunk = []
+    async for chunk in response.body_iterator:
+        decoded = decoder.decompress(chunk)
+        if decoded:
+            assert decoded.endswith(b"\n")
+            rows_per_chunk.append([json.loads(line) for line in decoded.splitlines()])
+    # Each slice of rows is readable as soon as it is sent, not only once the compressor's window fills
+    assert [len(rows) for rows in rows_per_chunk] == [10, 10, 10]
+
+
+async def test_compressed_streams_decode_to_the_same_rows(client):
+    body = {"count": 1500, "seed": 3, "reference_time": REFERENCE_TIME}
+    plain = await client.post("/api/transactions/stream", json=body, headers={"Accept-Encoding": "identity"})
+    compressed = await client.post("/api/transactions/stream", json=body, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.content == plain.content
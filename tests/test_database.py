@@ -0,0 +1,40 @@
+"""Named Mongo client profiles: one lazily created client per profile with its own write concern"""
+import pytest
+
+from tests.helpers import REFERENCE_TIME
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def database():
+    import database
+
+    yield database
+    database.close_clients()
+
+
+def test_profiles_get_their_own_clients_and_write_concerns(database, monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "7")
+    safe = database.connect("safe")
+    bulk_load = database.connect("bulk-load")
+
+    assert database.connect("bulk-load") is bulk_load
+    assert bulk_load.client is not safe.client
+    assert safe.client.write_concern.document == {}
+    assert bulk_load.client.write_concern.document == {"w": 1, "j": False}
+    assert bulk_load.client.options.pool_options.max_pool_size == safe.client.options.pool_options.max_pool_size == 7
+
+
+def test_default_profile_comes_from_the_environment(database, monkeypatch):
+    monkeypatch.setenv("MONGO_DEFAULT_PROFILE", "bulk-load")
+    assert database.get_db() is database.connect("bulk-load")
+    with pytest.raises(ValueError):
+        database.profile_options("fast-and-loose")
+
+
+async def test_requests_name_only_known_profiles(client):
+    body = {"count": 5, "seed": 1, "reference_time": REFERENCE_TIME}
+    assert (await client.post("/api/transactions/generate", json={**body, "db_profile": "bulk-load"})).status_code == 200
+    assert (await client.post("/api/transactions/generate", json={**body, "db_profile": "turbo"})).status_code == 422
+    assert (await client.post("/api/transactions/export", json={"db_profile": "turbo"})).status_code == 422
@@ -0,0 +1,125 @@
+"""Seeded generation: the same seed gives the same rows inline, on the process pool and through the API"""
+import pytest
+
+from tests.helpers import NOW, PARAMS, REFERENCE_TIME, generate
+
+pytestmark = pytest.mark.anyio
+
+
+def test_seeded_chunks_are_reproducible():
+    from generation import generate_seeded_documents
+
+    first = generate_seeded_documents(42, 3, 10000, NOW, PARAMS)
+    assert first == generate_seeded_documents(42, 3, 10000, NOW, PARAMS)
+    assert len(first) == 1000
+    assert first != generate_seeded_documents(43, 3, 10000, NOW, PARAMS)
+    assert first != generate_seeded_documents(42, 4, 10000, NOW, PARAMS)
+
+
+def test_seeded_ids_do_not_collide_across_chunks_or_seeds():
+    from generation import generate_seeded_documents
+
+    documents = [
+        document
+        for seed in (1, 2)
+        for chunk_index in range(3)
+        for document in generate_seeded_documents(seed, chunk_index, 3000, NOW, PARAMS)
+    ]
+    assert len({document["id"] for document in documents}) == len(documents)
+    assert len({document["transaction_id"] for document in documents}) == len(documents)
+
+
+async def test_generate_endpoint_reproduces_a_seed(client):
+    first = await generate(client, 500, 11)
+    assert (await client.delete("/api/transactions")).status_code == 200
+    assert await generate(client, 500, 11) == first
+
+
+async def test_regenerating_a_stored_seed_conflicts(client):
+    await generate(client, 20, 12)
+    response = await client.post("/api/transactions/generate", json={"count": 20, "seed": 12, "reference_time": REFERENCE_TIME})
+    assert response.status_code == 409
+
+
+async def test_partly_overlapping_runs_conflict_instead_of_listing_rows_they_did_not_store(client):
+    first = await generate(client, 10, 13)
+    response = await client.post("/api/transactions/generate", json={"count": 25, "seed": 13, "reference_time": REFERENCE_TIME})
+    assert response.status_code == 409
+    assert (response.headers["x-inserted-count"], response.headers["x-failed-count"]) == ("15", "10")
+    stored = await client.post("/api/transactions/export", json={"format": "json"})
+    assert len(stored.json()) == 25
+    assert {row["id"] for row in first} < {row["id"] for row in stored.json()}
+
+
+@pytest.mark.parametrize("seed", [-1, 2**64])
+async def test_seeds_outside_64_bits_are_rejected(client, seed):
+    response = await client.post("/api/transactions/generate", json={"count": 5, "seed": seed})
+    assert response.status_code == 422
+
+
+@pytest.fixture
+def generation_pool(monkeypatch):
+    """Send every run through a two-worker process pool, shut down after the test"""
+    import server
+
+    monkeypatch.setattr(server, "PARALLEL_GENERATION_THRESHOLD", 0)
+    monkeypatch.setattr(server, "GENERATION_WORKERS", 2)
+    monkeypatch.setattr(server, "generation_pool", None)
+    yield server
+    if server.generation_pool is not None:
+        server.generation_pool.shutdown()
+
+
+async def collect(server, count: int, seed: int) -> list:
+    documents = []
+    async for chunk in server.generate_document_chunks(count, seed, NOW, PARAMS):
+        documents += chunk
+    return documents
+
+
+async def test_pool_generation_matches_inline(generation_pool):
+    from generation import generate_seeded_documents
+
+    pooled = await collect(generation_pool, 6500, 7)
+    assert generation_pool.generation_pool is not None
+    inline = [document for chunk_index in range(7) for document in generate_seeded_documents(7, chunk_index, 6500, NOW, PARAMS)]
+    assert pooled == inline
+
+
+@pytest.mark.parametrize("method, path", [
+    ("POST", "/api/transactions/generate"),
+    ("POST", "/api/transactions/stream"),
+    ("GET", "/api/transactions/stream"),
+    ("POST", "/api/jobs/generate"),
+])
+async def test_max_amount_below_min_amount_is_rejected(client, method, path):
+    bounds = {"count": 5, "min_amount": 500, "max_amount": 10}
+    if method == "GET":
+        response = await client.get(path, params=bounds)
+    else:
+        response = await client.post(path, json=bounds)
+    assert response.status_code == 422
+    assert "max_amount" in response.text
+
+
+def test_ids_depend_only_on_the_seed_and_row():
+    from generation import generate_seeded_documents
+
+    ten = generate_seeded_documents(1, 0, 10, NOW, PARAMS)
+    twenty = generate_seeded_documents(1, 0, 20, NOW, {**PARAMS, "status": "pending", "max_amount": 50.0})
+    assert [row["id"] for row in ten] == [row["id"] for row in twenty[:10]]
+    assert [row["transaction_id"] for row in ten] == [row["transaction_id"] for row in twenty[:10]]
+
+
+@pytest.mark.parametrize("runs", [
+    [{"count": 10}, {"count": 20}, {"count": 10, "status": "pending"}],
+    [{"count": 1000}, {"count": 1000, "lifecycles": True}, {"count": 500, "scenario": "retail"}],
+])
+async def test_rerunning_a_seed_with_other_parameters_stores_each_transaction_id_once(client, runs):
+    for params in runs:
+        await client.post("/api/transactions/generate", json={"seed": 1, "reference_time": REFERENCE_TIME, **params})
+
+    response = await client.post("/api/transactions/export", json={"format": "json"})
+    transaction_ids = [row["transaction_id"] for row in response.json()]
+    assert len(transaction_ids) == len(set(transaction_ids))
+    assert max(params["count"] for params in runs) <= len(transaction_ids)
@@ -0,0 +1,79 @@
+"""Background generation jobs: progress adds up, cancellation stops the run and keeps what was written"""
+import asyncio
+import json
+
+import pytest
+
+from tests.helpers import REFERENCE_TIME, wait_for_job
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_job_progress_adds_up_to_the_stored_rows(client, job_manager):
+    response = await client.post("/api/jobs/generate", json={"count": 3500, "seed": 1, "reference_time": REFERENCE_TIME})
+    assert response.status_code == 202
+    job = await wait_for_job(client, response.json()["id"], lambda job: job["status"] == "completed")
+
+    assert job["unit"] == "transactions"
+    assert job["total"] == job["generated"] == job["generated_rows"] == job["persisted"] == 3500
+    assert job["failed"] == 0
+    assert job["result"] == {"seed": 1}
+    assert (await client.get("/api/transactions/stats")).json()["total_transactions"] == 3500
+    assert job["id"] in {listed["id"] for listed in (await client.get("/api/jobs")).json()}
+
+
+async def test_cancelling_a_running_job_keeps_persisted_rows(client, job_manager, monkeypatch):
+    from storage import get_store
+
+    store = get_store()
+    insert_batch = store.insert_batch
+
+    async def slow_insert(*args, **kwargs):
+        await asyncio.sleep(0.02)
+        return await insert_batch(*args, **kwargs)
+
+    monkeypatch.setattr(store, "insert_batch", slow_insert)
+    response = await client.post("/api/jobs/generate", json={"count": 50000, "seed": 2, "reference_time": REFERENCE_TIME})
+    job_id = response.json()["id"]
+    await wait_for_job(client, job_id, lambda job: job["persisted"] > 0)
+
+    assert (await client.delete(f"/api/jobs/{job_id}")).status_code == 200
+    job = await wait_for_job(client, job_id, lambda job: job["status"] == "cancelled")
+    assert 0 < job["persisted"] < 50000
+    assert job["finished_at"] is not None
+    await asyncio.sleep(0.1)
+    assert (await client.get("/api/transactions/stats")).json()["total_transactions"] == job["persisted"]
+
+
+async def test_job_events_stream_until_the_job_finishes(client, job_manager):
+    response = await client.post("/api/jobs/generate", json={"count": 1000, "seed": 3, "reference_time": REFERENCE_TIME})
+    events = await client.get(f"/api/jobs/{response.json()['id']}/events")
+    snapshots = [json.loads(line[len("data: "):]) for line in events.text.splitlines() if line.startswith("data: ")]
+    assert snapshots[-1]["status"] == "completed"
+    assert snapshots[-1]["persisted"] == 1000
+
+
+async def test_unknown_jobs_are_404(client):
+    assert (await client.get("/api/jobs/no-such-job")).status_code == 404
+    assert (await client.delete("/api/jobs/no-such-job")).status_code == 404
+
+
+async def test_a_full_queue_rejects_jobs_and_queued_jobs_cancel_without_running():
+    from jobs import JobManager, JobQueueFull
+
+    ran = []
+
+    async def runner(job):
+        ran.append(job.id)
+
+    manager = JobManager(runner, workers=1, queue_size=2)
+    first, second = manager.submit("first", total=1), manager.submit("second", total=1)
+    with pytest.raises(JobQueueFull):
+        manager.submit("third", total=1)
+
+    assert manager.cancel(second.id).status == "cancelled"
+    manager.start()
+    await asyncio.wait_for(manager.queue.join(), 5)
+    await manager.stop()
+    assert ran == [first.id]
+    assert first.status == "completed"
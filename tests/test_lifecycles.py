@@ -0,0 +1,111 @@
+"""Payment lifecycles: merged streams are time-ordered and every follow-up links to a coherent parent"""
+import pytest
+
+from tests.helpers import NOW, PARAMS, REFERENCE_TIME, wait_for_job
+
+pytestmark = pytest.mark.anyio
+
+
+def merged_run(count: int, seed: int, first_chunk: int = 0, last_chunk: int = None) -> list:
+    from generation import seeded_chunk_count
+    from lifecycles import LifecycleMerger, generate_lifecycle_chunk
+
+    last_chunk = seeded_chunk_count(count) if last_chunk is None else last_chunk
+    merger = LifecycleMerger(count, NOW, PARAMS["days_back"], first_chunk)
+    events = []
+    for chunk_index in range(first_chunk, last_chunk):
+        events += merger.merge(*generate_lifecycle_chunk(seed, chunk_index, count, NOW, PARAMS))
+    return events + merger.drain()
+
+
+def check_chain(event: dict, parent: dict):
+    assert parent["timestamp"] < event["timestamp"] <= NOW
+    for field in ("payer_email", "recipient_email", "merchant_id", "currency"):
+        assert event[field] == parent[field]
+
+    if event["transaction_type"] == "refund":
+        assert parent["transaction_type"] == "payment"
+        assert 0 < -event["amount"] <= parent["amount"]
+        if -event["amount"] == parent["amount"]:
+            assert parent["status"] == "refunded"
+    elif event["transaction_type"] == "dispute":
+        assert parent["transaction_type"] == "payment"
+        assert parent["status"] == "disputed"
+        assert event["amount"] == parent["amount"]
+    else:
+        assert event["transaction_type"] == "chargeback"
+        assert parent["transaction_type"] == "dispute"
+        assert event["amount"] == -parent["amount"]
+
+
+def test_merged_run_is_time_ordered_with_linked_chains():
+    events = merged_run(20_000, 3)
+    by_id = {event["transaction_id"]: event for event in events}
+    assert len(by_id) == len(events)
+    assert len({event["id"] for event in events}) == len(events)
+
+    timestamps = [event["timestamp"] for event in events]
+    assert timestamps == sorted(timestamps)
+
+    payments = [event for event in events if event["parent_transaction_id"] is None]
+    assert len(payments) == 20_000
+    assert all(payment["transaction_type"] == "payment" for payment in payments)
+
+    follow_ups = [event for event in events if event["parent_transaction_id"] is not None]
+    assert {event["transaction_type"] for event in follow_ups} == {"refund", "dispute", "chargeback"}
+    for event in follow_ups:
+        check_chain(event, by_id[event["parent_transaction_id"]])
+
+
+def test_payments_are_only_marked_by_their_follow_ups():
+    events = merged_run(10_000, 4)
+    parents = {event["parent_transaction_id"] for event in events}
+    for event in events:
+        if event["parent_transaction_id"] is None and event["status"] in ("refunded", "disputed"):
+            assert event["transaction_id"] in parents
+
+
+def test_runs_are_reproducible_and_split_cleanly():
+    whole = merged_run(6000, 5)
+    assert whole == merged_run(6000, 5)
+    # Shards of a run hold the same events, each shard in time order
+    shards = merged_run(6000, 5, 0, 3) + merged_run(6000, 5, 3, 6)
+    assert sorted(event["id"] for event in shards) == sorted(event["id"] for event in whole)
+
+
+def test_merger_holds_only_open_lifecycles():
+    from lifecycles import LifecycleMerger, generate_lifecycle_chunk
+
+    merger = LifecycleMerger(50_000, NOW, 30)
+    peak = 0
+    for chunk_index in range(50):
+        merger.merge(*generate_lifecycle_chunk(6, chunk_index, 50_000, NOW, PARAMS))
+        peak = max(peak, len(merger))
+    assert len(merger) == 0
+    assert peak < 5000
+
+
+async def test_generate_endpoint_emits_lifecycles(client):
+    response = await client.post(
+        "/api/transactions/generate",
+        json={"count": 1000, "seed": 7, "reference_time": REFERENCE_TIME, "lifecycles": True}
+    )
+    assert response.status_code == 200
+    events = response.json()
+    assert sum(event["parent_transaction_id"] is None for event in events) == 1000
+    assert len(events) > 1000
+    stored = {event["transaction_id"] for event in events}
+    assert all(event["parent_transaction_id"] in stored for event in events if event["parent_transaction_id"])
+
+
+async def test_lifecycle_jobs_count_payments_and_rows_separately(client, job_manager):
+    response = await client.post(
+        "/api/jobs/generate",
+        json={"count": 5000, "seed": 8, "reference_time": REFERENCE_TIME, "lifecycles": True}
+    )
+    job = await wait_for_job(client, response.json()["id"], lambda job: job["status"] == "completed")
+
+    assert job["unit"] == "payments"
+    assert job["generated"] == job["total"] == 5000
+    assert job["persisted"] == job["generated_rows"] > 5000
+    assert (await client.get("/api/transactions/stats")).json()["total_transactions"] == job["persisted"]
@@ -0,0 +1,108 @@
+"""Mongo partitioning over mongomock: partitioned reads merge like one collection, retention drops whole partitions"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.helpers import REFERENCE_TIME, generate, walk_pages
+
+pytest.importorskip("mongomock_motor")
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def use_mongo(app):
+    """Returns a function that points the app at a MongoStore over a fresh mongomock database"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import database
+    from storage import set_store
+    from storage.mongo import MongoStore
+
+    async def use(**options) -> MongoStore:
+        database.use_client(AsyncMongoMockClient(), os.environ["DB_NAME"])
+        store = MongoStore(**options)
+        set_store(store)
+        await store.setup()
+        return store
+
+    yield use
+    database.close_clients()
+
+
+async def stored_views(client) -> dict:
+    export = await client.post("/api/transactions/export", json={"format": "ndjson", "status": "completed"})
+    return {
+        "walk": [row["id"] for row in await walk_pages(client, limit=200)],
+        "filtered": [row["id"] for row in await walk_pages(client, limit=60, transaction_type="refund")],
+        "offset": [row["id"] for row in (await client.get("/api/transactions", params={"limit": 25, "skip": 150})).json()],
+        "export": export.text.splitlines()
+    }
+
+
+@pytest.mark.parametrize("partitioning", ["month", "run"])
+async def test_partitioned_reads_match_a_single_collection(client, use_mongo, partitioning):
+    views = {}
+    for mode in ("none", partitioning):
+        await use_mongo(partitioning=mode)
+        for seed in (1, 2):
+            await generate(client, 400, seed, days_back=60)
+        views[mode] = await stored_views(client)
+
+    assert len(views["none"]["walk"]) == 800
+    assert views[partitioning] == views["none"]
+    partitions = (await client.get("/api/admin/partitions")).json()
+    assert len(partitions) >= 2
+    assert sum(partition["count"] for partition in partitions) == 800
+
+
+async def test_dropping_a_partition_removes_its_rows_and_stats(client, use_mongo):
+    await use_mongo(partitioning="run")
+    await generate(client, 500, 1)
+    await generate(client, 300, 2)
+
+    response = await client.delete("/api/admin/partitions/transactions_run_1")
+    assert response.status_code == 200
+    assert len(await walk_pages(client, limit=1000)) == 300
+    assert (await client.get("/api/transactions/stats")).json()["total_transactions"] == 300
+    assert (await client.delete("/api/admin/partitions/transactions_run_1")).status_code == 404
+
+
+async def test_run_partitioning_requires_a_seed(client, use_mongo):
+    await use_mongo(partitioning="run")
+    response = await client.post("/api/transactions/generate", json={"count": 5})
+    assert response.status_code == 422
+
+
+async def test_retention_drops_expired_partitions(client, use_mongo):
+    await use_mongo(partitioning="month", retention_days=40)
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=40)
+    cutoff_day = datetime(cutoff.year, cutoff.month, cutoff.day)
+    response = await client.post(
+        "/api/transactions/generate",
+        json={"count": 1000, "seed": 3, "days_back": 120, "reference_time": now.isoformat()}
+    )
+    rows = response.json()
+    live = [row for row in rows if datetime.fromisoformat(row["timestamp"]) >= cutoff_day]
+
+    # Stats leave out expired days even before the retention pass runs
+    assert (await client.get("/api/transactions/stats")).json()["total_transactions"] == len(live)
+
+    result = (await client.post("/api/admin/retention/run")).json()
+    assert result["dropped_partitions"]
+    assert result["trimmed_rollups"] > 0
+    remaining = {partition["name"] for partition in (await client.get("/api/admin/partitions")).json()}
+    assert not remaining & set(result["dropped_partitions"])
+    for partition in (await client.get("/api/admin/partitions")).json():
+        assert datetime.fromisoformat(partition["max_timestamp"]) >= cutoff
+    assert (await client.get("/api/transactions/stats")).json()["total_transactions"] == len(live)
+
+
+async def test_rerunning_a_seed_stays_in_its_partition(client, use_mongo):
+    await use_mongo(partitioning="run")
+    await generate(client, 200, 9)
+    response = await client.post("/api/transactions/generate", json={"count": 200, "seed": 9, "reference_time": REFERENCE_TIME})
+    assert response.status_code == 409
+    assert [partition["name"] for partition in (await client.get("/api/admin/partitions")).json()] == ["transactions_run_9"]
@@ -0,0 +1,104 @@
+"""Scenario profiles: alias-table draws follow their weights and bundled profiles compile"""
+import numpy as np
+import pytest
+
+from tests.helpers import generate
+
+pytestmark = pytest.mark.anyio
+
+DRAWS = 400_000
+
+
+@pytest.mark.parametrize("weights", [
+    [5, 1, 3, 0.5, 0.5],
+    [1, 1],
+    [0.97, 0.01, 0.01, 0.01],
+    [2, 0, 1],
+])
+def test_alias_table_frequencies_follow_weights(weights):
+    from scenarios import AliasTable
+
+    draws = AliasTable(weights).sample(np.random.default_rng(0), DRAWS)
+    frequencies = np.bincount(draws, minlength=len(weights)) / DRAWS
+    expected = np.asarray(weights) / sum(weights)
+    # Five standard errors of a binomial proportion
+    tolerance = 5 * np.sqrt(expected * (1 - expected) / DRAWS) + 1e-9
+    assert np.all(np.abs(frequencies - expected) <= tolerance)
+
+
+def test_alias_table_never_draws_zero_weights():
+    from scenarios import AliasTable
+
+    draws = AliasTable([0, 3, 0, 1]).sample(np.random.default_rng(1), 50_000)
+    assert set(np.unique(draws).tolist()) == {1, 3}
+
+
+def test_bundled_profiles_compile():
+    from scenarios import get_scenario, list_scenarios
+
+    names = [scenario["name"] for scenario in list_scenarios()]
+    assert {"retail", "subscriptions", "b2b-invoicing"} <= set(names)
+    for name in names:
+        get_scenario(name)
+
+
+@pytest.mark.parametrize("name", ["../etc/passwd", "missing"])
+def test_unknown_or_unsafe_names_are_rejected(name):
+    from scenarios import ScenarioError, get_scenario
+
+    with pytest.raises(ScenarioError):
+        get_scenario(name)
+
+
+async def test_generated_rows_follow_the_profile(client):
+    rows = []
+    for seed in range(3):
+        rows += await generate(client, 1000, seed, scenario="retail")
+
+    currencies = {row["currency"] for row in rows}
+    assert currencies <= {"USD", "EUR", "GBP", "CAD"}
+    payments = sum(row["transaction_type"] == "payment" for row in rows) / len(rows)
+    assert payments == pytest.approx(0.82, abs=0.03)
+    assert all(row["amount"] in (4.99, 9.99, 14.99, 29.99) for row in rows if row["transaction_type"] == "subscription")
+
+
+async def test_generate_rejects_unknown_scenarios(client):
+    response = await client.post("/api/transactions/generate", json={"count": 5, "scenario": "no-such-scenario"})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("profile", [
+    {"amounts": {"default": {"distribution": "uniform", "min": "cheap"}}},
+    {"amounts": {"default": {"distribution": "lognormal", "median": -40}}},
+    {"amounts": {"default": {"distribution": "lognormal", "median": 40, "sigma": -1}}},
+    {"amounts": {"default": {"distribution": "normal", "mean": 50, "std": -5}}},
+    {"amounts": {"default": {"distribution": "choice", "values": [9.99, 19.99], "weights": [1]}}},
+    {"amounts": {"default": {"distribution": "choice", "values": [9.99, 19.99], "weights": [2, -1]}}},
+    {"amounts": {"default": {"distribution": "choice", "values": [9.99, 19.99], "weights": [0, 0]}}},
+    {"amounts": {"default": {"distribution": "choice", "values": []}}},
+    {"amounts": {"default": {"distribution": "choice", "values": ["free"]}}},
+    {"amounts": {"default": {"distribution": "lognormal"}}},
+    {"currencies": {"USD": "most"}},
+    {"currencies": {"USD": -1, "EUR": 2}},
+    {"fees": {"default": {"rate": -0.03}}},
+    {"timestamps": {"hourly": [1] * 23}},
+    {"transaction_types": {"payment": 1, "gift": 1}},
+    ["not", "a", "mapping"],
+])
+def test_invalid_profiles_fail_to_compile_with_a_scenario_error(profile):
+    from scenarios import ScenarioError, compile_scenario
+
+    with pytest.raises(ScenarioError):
+        compile_scenario(profile)
+
+
+def test_invalid_profile_files_are_listed_with_their_error(monkeypatch, tmp_path):
+    import scenarios
+
+    (tmp_path / "broken.yaml").write_text("amounts:\n  default: {distribution: lognormal, median: 40, sigma: -1}\n")
+    (tmp_path / "fine.yaml").write_text("description: Defaults only\n")
+    monkeypatch.setattr(scenarios, "SCENARIO_DIR", tmp_path)
+
+    listed = {scenario["name"]: scenario for scenario in scenarios.list_scenarios()}
+    assert "sigma" in listed["broken"]["error"]
+    assert listed["fine"] == {"name": "fine", "description": "Defaults only"}
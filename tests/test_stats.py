@@ -0,0 +1,78 @@
+"""Stats served from rollups, cached or not, must agree with a recount of the stored rows"""
+from collections import Counter, defaultdict
+
+import pytest
+
+from tests.helpers import generate
+
+pytestmark = pytest.mark.anyio
+
+
+async def recount(client) -> dict:
+    response = await client.post("/api/transactions/export", json={"format": "json"})
+    rows = response.json()
+    amounts = defaultdict(float)
+    for row in rows:
+        amounts[row["transaction_type"]] += row["amount"]
+    return {
+        "total": len(rows),
+        "by_type": Counter(row["transaction_type"] for row in rows),
+        "by_status": Counter(row["status"] for row in rows),
+        "amounts": amounts
+    }
+
+
+def assert_matches(stats: dict, expected: dict):
+    assert stats["total_transactions"] == expected["total"]
+    assert stats["by_status"] == dict(expected["by_status"])
+    assert {name: value["count"] for name, value in stats["by_type"].items()} == dict(expected["by_type"])
+    for name, value in stats["by_type"].items():
+        assert value["total_amount"] == pytest.approx(expected["amounts"][name])
+
+
+async def test_stats_follow_writes(client):
+    await generate(client, 400, 4)
+    assert (await client.get("/api/transactions/stats")).json()["total_transactions"] == 400
+
+    await generate(client, 300, 5)
+    stats = (await client.get("/api/transactions/stats")).json()
+    assert_matches(stats, await recount(client))
+
+    await client.delete("/api/transactions")
+    stats = (await client.get("/api/transactions/stats")).json()
+    assert stats["total_transactions"] == 0
+    assert stats["by_type"] == {}
+
+
+async def test_cached_stats_are_served_until_the_next_write(client, monkeypatch):
+    import server
+
+    await generate(client, 200, 6)
+    first = (await client.get("/api/transactions/stats")).json()
+
+    async def unreachable():
+        raise AssertionError("stats recomputed without a write")
+
+    monkeypatch.setattr(server, "compute_transaction_stats", unreachable)
+    assert (await client.get("/api/transactions/stats")).json() == first
+
+    monkeypatch.undo()
+    await generate(client, 100, 7)
+    assert (await client.get("/api/transactions/stats")).json()["total_transactions"] == 300
+
+
+async def test_rollups_match_a_full_recount(client):
+    for seed in (1, 2, 3):
+        await generate(client, 1000, seed)
+
+    stats = (await client.get("/api/transactions/stats")).json()
+    assert_matches(stats, await recount(client))
+    assert stats["recent_transactions"] <= stats["total_transactions"]
+
+
+async def test_rebuilt_rollups_match_a_full_recount(client):
+    await generate(client, 400, 4)
+    await generate(client, 300, 5)
+
+    assert (await client.post("/api/admin/rollups/rebuild")).status_code == 200
+    assert_matches((await client.get("/api/transactions/stats")).json(), await recount(client))
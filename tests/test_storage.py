@@ -0,0 +1,32 @@
+"""Storage interface: aware datetimes are compared as the naive UTC timestamps rows are stored with"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tests.helpers import generate
+
+pytestmark = pytest.mark.anyio
+
+
+def test_filters_convert_aware_dates_to_naive_utc():
+    from storage import TransactionFilter
+
+    eastern = timezone(timedelta(hours=-5))
+    filters = TransactionFilter(start_date=datetime(2026, 1, 1, 19, tzinfo=eastern), end_date=datetime(2026, 1, 3))
+    assert filters.start_date == datetime(2026, 1, 2, 0)
+    assert filters.end_date == datetime(2026, 1, 3)
+
+
+async def test_timezone_aware_cursor_and_dates(client):
+    stored = await generate(client, 300, 6)
+    newest = max(stored, key=lambda row: (row["timestamp"], row["id"]))
+    cursor = base64.urlsafe_b64encode(json.dumps({"t": newest["timestamp"] + "+00:00", "id": newest["id"]}).encode()).decode()
+    response = await client.get("/api/transactions", params={"cursor": cursor, "limit": 1000})
+    assert response.status_code == 200
+    assert len(response.json()) == len(stored) - 1
+
+    response = await client.post("/api/transactions/export", json={"format": "ndjson", "start_date": "2020-01-01T00:00:00Z"})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == len(stored)